@@ -0,0 +1,141 @@
+"""
+Per-request latency of 'astro sun' and 'astro moon'.
+
+    python bench/bench_astro.py --data-dir ./data
+    python bench/bench_astro.py --data-dir ./data --reload
+
+'search' finds rise and set times per request, 'table' looks them up in
+a precomputed almanac table the way the command does. --reload also
+loads the timescale and ephemeris again on every call, the way astro did
+before they were shared, for comparison.
+"""
+
+import argparse
+from datetime import timedelta
+from pathlib import Path
+import statistics
+import sys
+import time
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import pytz
+from skyfield import almanac
+from skyfield.api import Loader, Topos
+
+from door.commands.astro import sky, tables
+from door.geo import grid_cell, timezone_at
+
+
+def next_rise_set(latitude: float, longitude: float, function):
+    """
+    the first rising and setting in the next day, found per request
+    the way astro did before almanac tables
+    """
+    ts = sky.timescale()
+    t0 = ts.now()
+    t1 = ts.now() + timedelta(days=1)
+    times, events = almanac.find_discrete(t0, t1, function)
+    tz = pytz.timezone(timezone_at(latitude, longitude))
+
+    rise, set = None, None
+    for time, event in zip(times, events):
+        dt = time.utc_datetime().replace(tzinfo=pytz.UTC).astimezone(tz)
+        if event == 1 and rise is None:
+            rise = dt
+        elif event == 0 and set is None:
+            set = dt
+    return rise, set
+
+
+def search_sun(latitude: float, longitude: float):
+    sky.solar_position(latitude, longitude)
+    e = sky.ephemeris()
+    observer = Topos(latitude, longitude)
+    next_rise_set(latitude, longitude, almanac.sunrise_sunset(e, observer))
+
+
+def search_moon(latitude: float, longitude: float):
+    sky.moon_phase()
+    e = sky.ephemeris()
+    observer = Topos(latitude, longitude)
+    next_rise_set(
+        latitude,
+        longitude,
+        almanac.risings_and_settings(e, e["moon"], observer),
+    )
+
+
+def table_requests(days: int):
+    """
+    sun and moon requests answered from tables, computed on first use
+    """
+    computed = {}
+
+    def table(latitude: float, longitude: float) -> tables.Almanac:
+        cell = grid_cell(latitude, longitude, 0.1)
+        if cell not in computed:
+            computed[cell] = tables.compute(cell, timezone_at(*cell), days)
+        return computed[cell]
+
+    def sun(latitude: float, longitude: float):
+        sky.solar_position(latitude, longitude)
+        table(latitude, longitude).next_sun(time.time())
+
+    def moon(latitude: float, longitude: float):
+        almanac = table(latitude, longitude)
+        almanac.phase(time.time())
+        almanac.next_moon(time.time())
+
+    return sun, moon
+
+
+def measure(request, latitude: float, longitude: float, runs: int) -> list[float]:
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        request(latitude, longitude)
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--data-dir", type=Path, default=Path("./data"))
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--days", type=int, default=8, help="almanac table length")
+    parser.add_argument("--latitude", type=float, default=33.548786)
+    parser.add_argument("--longitude", type=float, default=-101.905093)
+    parser.add_argument("--reload", action="store_true", help="load files per call")
+    args = parser.parse_args()
+
+    sky.use_data_dir(args.data_dir)
+    if args.reload:
+        loader = Loader(str(args.data_dir))
+        sky.timescale = lambda: loader.timescale()
+        sky.ephemeris = lambda: loader("de421.bsp")
+
+    # first call downloads and loads, not counted
+    search_sun(args.latitude, args.longitude)
+
+    table_sun, table_moon = table_requests(args.days)
+    started = time.perf_counter()
+    table_sun(args.latitude, args.longitude)
+    print(f"table for one cell: {(time.perf_counter() - started) * 1000:.1f}ms")
+
+    for name, request in (
+        ("sun search", search_sun),
+        ("moon search", search_moon),
+        ("sun table", table_sun),
+        ("moon table", table_moon),
+    ):
+        timings = measure(request, args.latitude, args.longitude, args.runs)
+        p95 = sorted(timings)[int(len(timings) * 0.95) - 1]
+        print(
+            f"astro {name}: median {statistics.median(timings):.2f}ms, "
+            f"p95 {p95:.2f}ms, max {max(timings):.2f}ms ({args.runs} runs)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -9,6 +9,7 @@ from meshtastic.mesh_interface import MeshInterface
 from loguru import logger as log
 from pubsub import pub
 
+from .http import HttpClient
 from .models import NodeInfo
 
 
@@ -50,6 +51,9 @@ class BaseCommand:
     # global settings object
     settings: ConfigParser
 
+    # shared HTTP client with pooling, timeouts and retries - set by DoorManager
+    http: HttpClient
+
     def load(self):
         """
         raise CommandLoadError if we don't have resources necessary to operate
@@ -93,6 +97,18 @@ class BaseCommand:
         if node in self.interface.nodes:
             return NodeInfo(**self.interface.nodes[node])
 
+    def resolve_node(self, name: str) -> str:
+        """
+        node id from '!abcd1234' or a short name, None if we don't know it
+        """
+        if name.startswith("!"):
+            return name
+        for node_id, info in self.interface.nodes.items():
+            short_name = info.get("user", {}).get("shortName", "")
+            if short_name.strip().lower() == name.strip().lower():
+                return node_id
+        return None
+
     def get_setting(self, type, name: str, default=None):
         """
         fetch setting from the 'global' or module path section of the config file
@@ -0,0 +1,298 @@
+"""
+astro sun
+astro moon
+astro week
+astro iss
+astro sat <name or number>
+
+rise and set times and satellite passes come from tables computed per
+location cell in periodic(), see tables.py and satellites.py. a cell that
+isn't computed yet is answered by DM from a thread when it is
+"""
+
+from datetime import datetime, timedelta
+from pathlib import Path
+from threading import Lock, Thread
+
+from loguru import logger as log
+import pytz
+
+from .. import BaseCommand, CommandLoadError
+from ...geo import grid_cell, timezone_at
+from ...singleflight import SingleFlight
+from .sky import format_phase, moon_phase, phase_name, solar_position, use_data_dir
+from .satellites import PassTable, TleCache, format_passes
+from .tables import Almanac, compute
+
+
+def clock(value: datetime) -> str:
+    return value.strftime("%H:%M") if value else "--:--"
+
+
+class Astro(BaseCommand):
+    command = "astro"
+    description = "Displays astronomical data"
+    help = """'astro sun', 'astro moon', 'astro week'
+'astro iss', 'astro sat <name>' - visible passes"""
+
+    latitude: float
+    longitude: float
+
+    def load(self):
+        use_data_dir(self.get_setting(Path, "data_dir", Path("./data")))
+
+        self.default_latitude = self.settings.getfloat(
+            "global", "default_latitude", fallback=33.548786
+        )
+        self.default_longitude = self.settings.getfloat(
+            "global", "default_longitude", fallback=-101.905093
+        )
+
+        # almanac tables for every cell with a node in it
+        self.days = self.get_setting(int, "almanac_days", 8)
+        self.cell_size = self.get_setting(float, "almanac_cell_degrees", 0.1)
+        self.tables: dict[tuple[float, float], Almanac] = {}
+        self.lock = Lock()
+        self.flight = SingleFlight()
+        self.refreshing: Thread = None
+
+        # satellite passes, for the satellites listed here and any asked about
+        self.tle = TleCache(
+            self.get_setting(Path, "data_dir", Path("./data")) / "tle",
+            self.http,
+            groups=self.get_setting(str, "tle_groups", "stations,visual").split(","),
+            max_age=self.get_setting(float, "tle_refresh_hours", 12) * 3600,
+        )
+        self.tracked = set(
+            self.get_setting(str, "satellites", "ISS (ZARYA)").split(",")
+        )
+        self.pass_hours = self.get_setting(float, "pass_hours", 48)
+        self.min_altitude = self.get_setting(float, "pass_min_altitude", 10)
+        self.pass_tables: dict[tuple[float, float], PassTable] = {}
+        self.tle.load()
+
+        # run each function to make sure required resources are loaded
+        try:
+            solar_position(self.default_latitude, self.default_longitude)
+            moon_phase()
+        except:
+            log.exception("Failed to load Astro")
+            raise CommandLoadError()
+
+    def periodic(self):
+        if not (self.refreshing and self.refreshing.is_alive()):
+            self.refreshing = Thread(target=self.refresh_tables, name="astro tables")
+            self.refreshing.start()
+
+    def occupied_cells(self) -> set[tuple[float, float]]:
+        positions = [(self.default_latitude, self.default_longitude)]
+        for info in list(self.interface.nodes.values()):
+            position = info.get("position", {})
+            if position.get("latitude") and position.get("longitude"):
+                positions.append((position["latitude"], position["longitude"]))
+        return {grid_cell(lat, lon, self.cell_size) for lat, lon in positions}
+
+    def refresh_tables(self):
+        """
+        compute tables that are missing or start before today, drop empty cells
+        """
+        now = datetime.now(pytz.UTC).timestamp()
+        tables = {}
+        for cell in self.occupied_cells():
+            with self.lock:
+                table = self.tables.get(cell)
+            try:
+                if not table or not table.current(now):
+                    table = self.compute(cell)
+                tables[cell] = table
+            except:
+                log.exception(f"Failed to compute almanac for {cell}")
+        with self.lock:
+            self.tables = tables
+        log.debug(f"astro tables for {len(tables)} cells")
+
+        self.refresh_passes(now)
+
+    def refresh_passes(self, now: float):
+        """
+        passes of tracked satellites for every occupied cell, again after new TLEs
+        """
+        changed = self.tle.refresh()
+        satellites = [self.tle.find(name) for name in list(self.tracked)]
+        pass_tables = {}
+        for cell in self.occupied_cells():
+            with self.lock:
+                table = self.pass_tables.get(cell)
+            try:
+                if changed or not table or not table.current(now):
+                    table = self.new_pass_table(cell, now)
+                for satellite in satellites:
+                    if satellite:
+                        table.get(satellite)
+                pass_tables[cell] = table
+            except:
+                log.exception(f"Failed to compute satellite passes for {cell}")
+        with self.lock:
+            self.pass_tables = pass_tables
+
+    def new_pass_table(self, cell: tuple[float, float], now: float) -> PassTable:
+        return self.flight.do(
+            ("passes", cell),
+            lambda: PassTable(cell, self.pass_hours, self.min_altitude, now),
+        )
+
+    def ready(self, msg: str, latitude: float, longitude: float) -> bool:
+        """
+        True if msg can be answered from tables that are already computed
+        """
+        cell = grid_cell(latitude, longitude, self.cell_size)
+        now = datetime.now(pytz.UTC).timestamp()
+        words = msg.lower().split()
+
+        name = None
+        if len(words) > 1 and words[1] == "iss":
+            name = "ISS"
+        elif len(words) > 2 and words[1] == "sat":
+            name = " ".join(words[2:])
+
+        if name:
+            satellite = self.tle.find(name)
+            if satellite is None:
+                # answered without any passes
+                return True
+            with self.lock:
+                table = self.pass_tables.get(cell)
+            return bool(table and table.current(now) and table.computed(satellite))
+
+        if any(word in msg.lower() for word in ("sun", "moon", "week")):
+            with self.lock:
+                table = self.tables.get(cell)
+            return bool(table and table.current(now))
+
+        return True
+
+    def pass_table(self, latitude: float, longitude: float) -> PassTable:
+        cell = grid_cell(latitude, longitude, self.cell_size)
+        now = datetime.now(pytz.UTC).timestamp()
+        with self.lock:
+            table = self.pass_tables.get(cell)
+        if not table or not table.current(now):
+            table = self.new_pass_table(cell, now)
+            with self.lock:
+                self.pass_tables[cell] = table
+        return table
+
+    def passes(self, name: str, latitude: float, longitude: float) -> str:
+        if not self.tle.satellites:
+            return "No satellite data yet, try again later"
+        satellite = self.tle.find(name)
+        if not satellite:
+            return f"Unknown satellite '{name}'"
+        # keep it ready for the next time
+        self.tracked.add(satellite.name)
+
+        table = self.pass_table(latitude, longitude)
+        now = datetime.now(pytz.UTC).timestamp()
+        # a table stays in use for half its window, don't claim the whole of it
+        return format_passes(
+            satellite,
+            table.get(satellite),
+            timezone_at(*table.cell),
+            table.hours_left(now),
+            now,
+        )
+
+    def compute(self, cell: tuple[float, float]) -> Almanac:
+        return self.flight.do(
+            cell, lambda: compute(cell, timezone_at(*cell), self.days)
+        )
+
+    def table(self, latitude: float, longitude: float) -> Almanac:
+        cell = grid_cell(latitude, longitude, self.cell_size)
+        with self.lock:
+            table = self.tables.get(cell)
+        if not table or not table.current(datetime.now(pytz.UTC).timestamp()):
+            # a node we haven't seen in periodic yet
+            table = self.compute(cell)
+            with self.lock:
+                self.tables[cell] = table
+        return table
+
+    def position(self, node: str) -> tuple[float, float]:
+        latitude = self.default_latitude
+        longitude = self.default_longitude
+
+        user = self.get_node(node)
+
+        if (
+            user
+            and user.position
+            and user.position.latitude
+            and user.position.longitude
+        ):
+            latitude = user.position.latitude
+            longitude = user.position.longitude
+            log.debug(f"user position: {round(latitude, 5)}, {round(longitude, 5)}")
+        return latitude, longitude
+
+    def invoke(self, msg: str, node: str) -> str:
+        latitude, longitude = self.position(node)
+        if self.ready(msg, latitude, longitude):
+            return self.reply(msg, latitude, longitude)
+        # computing a table takes a while, don't hold up the receive thread
+        self.run_in_thread(self.reply_later, msg, node)
+
+    def reply_later(self, msg: str, node: str):
+        latitude, longitude = self.position(node)
+        try:
+            reply = self.reply(msg, latitude, longitude)
+        except:
+            log.exception(f"Failed to answer '{msg}'")
+            reply = "Failed to compute that, try again later"
+        self.send_dm(reply, node)
+
+    def reply(self, msg: str, latitude: float, longitude: float) -> str:
+        now = datetime.now(pytz.UTC).timestamp()
+        words = msg.split()
+
+        if len(words) > 1 and words[1].lower() == "iss":
+            return self.passes("ISS", latitude, longitude)
+
+        elif len(words) > 2 and words[1].lower() == "sat":
+            return self.passes(" ".join(words[2:]), latitude, longitude)
+
+        elif "sun" in msg.lower():
+            altitude, azimuth = solar_position(latitude, longitude)
+            rise, set = self.table(latitude, longitude).next_sun(now)
+            return (
+                f"🌞 altitude: {altitude}°, azimuth: {azimuth}°\n"
+                f"🌅 Next Sunrise: {rise.strftime('%m-%d %H:%M') if rise else 'N/A'}\n"
+                f"🌇 Next Sunset: {set.strftime('%m-%d %H:%M') if set else 'N/A'}"
+            )
+
+        elif "moon" in msg.lower():
+            table = self.table(latitude, longitude)
+            rise, set = table.next_moon(now)
+            return (
+                f"{format_phase(table.phase(now))}\n"
+                f"🌕 Next Moonrise: {rise.strftime('%m-%d %H:%M') if rise else 'N/A'}\n"
+                f"🌑 Next Moonset: {set.strftime('%m-%d %H:%M') if set else 'N/A'}"
+            )
+
+        elif "week" in msg.lower():
+            return self.week(self.table(latitude, longitude))
+
+        else:
+            return self.description + "\n\n" + self.help
+
+    def week(self, table: Almanac) -> str:
+        """
+        'Mon ☀07:41-19:02 🌔' for the next seven days
+        """
+        lines = []
+        for offset in range(min(7, table.days)):
+            day = table.start + timedelta(days=offset)
+            rise, set, phase = table.day(day)
+            emoji = phase_name(phase).split()[-1]
+            lines.append(f"{day:%a} ☀{clock(rise)}-{clock(set)} {emoji}")
+        return "\n".join(lines)
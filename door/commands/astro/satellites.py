@@ -0,0 +1,254 @@
+"""
+Satellite passes over location cells.
+
+TLEs come from CelesTrak through the shared HttpClient and are kept in
+data_dir/tle/<group>.tle, so a failed refresh keeps using the last file.
+Passes are found on one time grid per cell: the altitude of a satellite
+at every step, whether it is sunlit, and whether the sky below is dark.
+"""
+
+from datetime import datetime
+from io import BytesIO
+from pathlib import Path
+import time
+from threading import Lock
+from typing import Optional
+
+from loguru import logger as log
+import numpy as np
+import pytz
+from skyfield.api import Topos
+from skyfield.iokit import parse_tle_file
+from skyfield.sgp4lib import EarthSatellite
+
+from ...geo import compass
+from ...http import HttpClient
+from .sky import ephemeris, timescale
+
+CELESTRAK = "https://celestrak.org/NORAD/elements/gp.php"
+
+# seconds between samples, a low pass lasts a few minutes
+STEP = 30
+
+# the sun is sampled less often and interpolated
+SUN_STEP = 10
+
+# below this the sky is dark enough to see a satellite, degrees
+TWILIGHT = -6
+
+
+class TleCache:
+    def __init__(
+        self, directory: Path, http: HttpClient, groups: list[str], max_age: float
+    ):
+        self.directory = directory
+        self.http = http
+        self.groups = groups
+        self.max_age = max_age
+
+        self.lock = Lock()
+        # in file order, so the first match for a name is the main object
+        self.satellites: list[EarthSatellite] = []
+
+    def path(self, group: str) -> Path:
+        return self.directory / f"{group}.tle"
+
+    def stale(self, group: str) -> bool:
+        path = self.path(group)
+        return not path.exists() or time.time() - path.stat().st_mtime > self.max_age
+
+    def refresh(self) -> bool:
+        """
+        download stale groups, True if anything changed
+        """
+        changed = False
+        for group in self.groups:
+            if not self.stale(group):
+                continue
+            try:
+                response = self.http.get(
+                    CELESTRAK, params={"GROUP": group, "FORMAT": "tle"}
+                )
+                response.raise_for_status()
+                if "\n1 " not in response.text:
+                    raise ValueError(response.text[:80])
+            except:
+                log.warning(f"Failed to refresh TLE group {group}, keeping the old one")
+                continue
+
+            self.directory.mkdir(parents=True, exist_ok=True)
+            partial = self.path(group).with_suffix(".part")
+            partial.write_bytes(response.content)
+            partial.replace(self.path(group))
+            changed = True
+
+        if changed or not self.satellites:
+            self.load()
+        return changed
+
+    def load(self):
+        satellites = []
+        for group in self.groups:
+            if self.path(group).exists():
+                lines = BytesIO(self.path(group).read_bytes())
+                satellites.extend(parse_tle_file(lines, timescale()))
+        with self.lock:
+            self.satellites = satellites
+        log.debug(f"{len(satellites)} satellites from TLE groups {self.groups}")
+
+    def find(self, name: str) -> Optional[EarthSatellite]:
+        """
+        by name, catalog number, first word of the name ('iss'), or part of the name
+        """
+        name = name.strip().upper()
+        with self.lock:
+            satellites = list(self.satellites)
+        tests = [
+            lambda s: s.name.upper() == name,
+            lambda s: str(s.model.satnum) == name,
+            lambda s: s.name.upper().split(" ")[0] == name,
+            lambda s: name in s.name.upper(),
+        ]
+        for test in tests:
+            for satellite in satellites:
+                if test(satellite):
+                    return satellite
+        return None
+
+
+class Pass:
+    def __init__(
+        self,
+        rise: float,
+        set: float,
+        altitude: float,
+        rise_azimuth: float,
+        set_azimuth: float,
+        visible: bool,
+    ):
+        # UTC seconds
+        self.rise = rise
+        self.set = set
+        self.altitude = altitude
+        self.rise_azimuth = rise_azimuth
+        self.set_azimuth = set_azimuth
+        self.visible = visible
+
+    def format(self, tz) -> str:
+        """
+        '10-19 19:42 4m 63° NW-SE'
+        """
+        start = datetime.fromtimestamp(self.rise, tz)
+        minutes = round((self.set - self.rise) / 60)
+        return (
+            f"{start:%m-%d %H:%M} {minutes}m {self.altitude:.0f}° "
+            f"{compass(self.rise_azimuth)}-{compass(self.set_azimuth)}"
+        )
+
+
+class PassTable:
+    """
+    passes over one cell for the next hours, per satellite catalog number
+    """
+
+    def __init__(
+        self, cell: tuple[float, float], hours: float, min_altitude: float, now: float
+    ):
+        self.cell = cell
+        self.start = now
+        self.hours = hours
+        self.min_altitude = min_altitude
+        self.observer = Topos(*cell)
+
+        ts, e = timescale(), ephemeris()
+        steps = int(hours * 3600 / STEP) + 1
+        self.seconds = now + np.arange(steps) * STEP
+        t0 = ts.from_datetime(datetime.fromtimestamp(now, pytz.UTC))
+        self.times = ts.tt_jd(t0.tt + np.arange(steps) * STEP / 86400)
+
+        # darkness at the observer, shared by every satellite
+        coarse = self.times[::SUN_STEP]
+        site = e["earth"] + self.observer
+        sun_altitude, _, _ = site.at(coarse).observe(e["sun"]).apparent().altaz()
+        self.dark = (
+            np.interp(self.seconds, self.seconds[::SUN_STEP], sun_altitude.degrees)
+            < TWILIGHT
+        )
+
+        self.lock = Lock()
+        self.passes: dict[int, list[Pass]] = {}
+
+    def current(self, now: float) -> bool:
+        """
+        at least half of the window is still ahead
+        """
+        return now < self.start + self.hours * 3600 / 2
+
+    def find(self, satellite: EarthSatellite) -> list[Pass]:
+        altitude, azimuth, _ = (satellite - self.observer).at(self.times).altaz()
+        altitude, azimuth = altitude.degrees, azimuth.degrees
+        sunlit = satellite.at(self.times).is_sunlit(ephemeris())
+
+        above = np.nan_to_num(altitude, nan=-90) > self.min_altitude
+        edges = np.diff(above.astype(np.int8))
+        starts = list(np.flatnonzero(edges == 1) + 1)
+        ends = list(np.flatnonzero(edges == -1) + 1)
+        if above[0]:
+            starts.insert(0, 0)
+        if above[-1]:
+            ends.append(len(above))
+
+        passes = []
+        for start, end in zip(starts, ends):
+            peak = start + int(np.argmax(altitude[start:end]))
+            passes.append(
+                Pass(
+                    rise=self.seconds[start],
+                    set=self.seconds[end - 1],
+                    altitude=altitude[peak],
+                    rise_azimuth=azimuth[start],
+                    set_azimuth=azimuth[end - 1],
+                    visible=bool((sunlit[start:end] & self.dark[start:end]).any()),
+                )
+            )
+        return passes
+
+    def hours_left(self, now: float) -> float:
+        """
+        how far ahead of now the table reaches
+        """
+        return (self.start - now) / 3600 + self.hours
+
+    def computed(self, satellite: EarthSatellite) -> bool:
+        with self.lock:
+            return satellite.model.satnum in self.passes
+
+    def get(self, satellite: EarthSatellite) -> list[Pass]:
+        with self.lock:
+            passes = self.passes.get(satellite.model.satnum)
+        if passes is None:
+            passes = self.find(satellite)
+            with self.lock:
+                self.passes[satellite.model.satnum] = passes
+        return passes
+
+
+def format_passes(
+    satellite: EarthSatellite,
+    passes: list[Pass],
+    timezone: str,
+    hours: float,
+    now: float,
+) -> str:
+    tz = pytz.timezone(timezone)
+    visible = [p for p in passes if p.visible and p.set > now]
+    if not visible:
+        return f"{satellite.name}: no visible passes in the next {hours:.0f}h"
+
+    reply = f"{satellite.name} visible passes:\n"
+    for p in visible:
+        line = p.format(tz) + "\n"
+        if len(reply + line) > 200:
+            break
+        reply += line
+    return reply.strip()
@@ -0,0 +1,149 @@
+"""
+Sun and moon from skyfield, with the ephemeris shared by the whole process
+"""
+
+from datetime import datetime
+from pathlib import Path
+from threading import Lock
+import numpy as np
+
+from skyfield.api import Loader, Topos
+from skyfield.jpllib import SpiceKernel
+from skyfield.timelib import Timescale
+
+# loaded once per process and shared by every request and thread,
+# jplephem memory-maps the ephemeris file
+_lock = Lock()
+_loader = Loader("./data/")
+_timescale: Timescale = None
+_planets: SpiceKernel = None
+
+
+def use_data_dir(data_dir: Path):
+    """
+    download and read skyfield files in data_dir, before anything is loaded
+    """
+    global _loader
+    with _lock:
+        if _timescale is None and _planets is None:
+            _loader = Loader(str(data_dir))
+
+
+def timescale() -> Timescale:
+    global _timescale
+    with _lock:
+        if _timescale is None:
+            _timescale = _loader.timescale()
+        return _timescale
+
+
+def ephemeris() -> SpiceKernel:
+    global _planets
+    with _lock:
+        if _planets is None:
+            _planets = _loader("de421.bsp")
+        return _planets
+
+
+def solar_position(
+    latitude,
+    longitude,
+) -> tuple[int, int]:
+    """
+    return is (altitude, azimuth) of the sun in degrees
+    """
+    ts = timescale()
+    planets = ephemeris()
+    earth = planets["earth"]
+    sun = planets["sun"]
+
+    # Define the observer's location
+    observer = earth + Topos(latitude, longitude)
+
+    # Get the current time
+    current_time = datetime.utcnow()
+    t = ts.utc(
+        current_time.year,
+        current_time.month,
+        current_time.day,
+        current_time.hour,
+        current_time.minute,
+        current_time.second,
+    )
+
+    # Compute the position of the sun
+    astrometric = observer.at(t).observe(sun)
+    alt, az, _ = astrometric.apparent().altaz()
+
+    return int(alt.degrees), int(az.degrees)
+
+
+def moon_phase():
+    ts = timescale()
+    planets = ephemeris()
+    earth = planets["earth"]
+    moon = planets["moon"]
+    sun = planets["sun"]
+
+    # Get the current time
+    current_time = datetime.utcnow()
+    t = ts.utc(
+        current_time.year,
+        current_time.month,
+        current_time.day,
+        current_time.hour,
+        current_time.minute,
+        current_time.second,
+    )
+
+    # Compute positions
+    astrometric_moon = earth.at(t).observe(moon)
+    astrometric_sun = earth.at(t).observe(sun)
+
+    # Get the positions in apparent altitude/azimuth
+    moon_apparent = astrometric_moon.apparent()
+    sun_apparent = astrometric_sun.apparent()
+
+    # Calculate the angular separation between the Sun and Moon
+    moon_ecliptic = moon_apparent.ecliptic_position().au
+    sun_ecliptic = sun_apparent.ecliptic_position().au
+
+    # Calculate the angle between the two bodies in radians
+    angle = np.arctan2(moon_ecliptic[1], moon_ecliptic[0]) - np.arctan2(
+        sun_ecliptic[1], sun_ecliptic[0]
+    )
+    angle = np.degrees(angle) % 360  # Convert to degrees and normalize
+
+    return format_phase(angle)
+
+
+def phase_name(angle: float) -> str:
+    """
+    angle is the Moon's ecliptic longitude less the Sun's, in degrees
+    """
+    angle = angle % 360
+    if angle < 1:
+        phase = f"New Moon 🌑"
+    elif angle < 45:
+        phase = f"Waxing Crescent 🌒"
+    elif angle < 90:
+        phase = f"First Quarter 🌓"
+    elif angle < 135:
+        phase = f"Waxing Gibbous 🌔"
+    elif angle < 180:
+        phase = f"Full Moon 🌕"
+    elif angle < 225:
+        phase = f"Waning Gibbous 🌖"
+    elif angle < 270:
+        phase = f"Last Quarter 🌗"
+    elif angle < 315:
+        phase = f"Waning Crescent 🌘"
+    else:
+        phase = f"New Moon 🌑"
+
+    return phase
+
+
+def format_phase(angle: float) -> str:
+    return phase_name(angle) + f" ({angle % 360:.1f}°)"
+
@@ -0,0 +1,127 @@
+"""
+Sun and moon almanac tables per location cell.
+
+Rise and set times only change once a day and barely across a cell, so
+they are found for the next days in one vectorized pass per cell and
+looked up from there. Times are UTC seconds.
+"""
+
+from datetime import date, datetime, time, timedelta
+from typing import Optional
+
+import numpy as np
+import pytz
+from skyfield import almanac
+from skyfield.api import Topos
+
+from .sky import ephemeris, timescale
+
+# moon phase samples per day, interpolated in between
+PHASE_STEPS = 4
+
+
+def utc_seconds(times) -> np.ndarray:
+    return np.array([t.timestamp() for t in times.utc_datetime()], dtype=np.float64)
+
+
+class Almanac:
+    def __init__(
+        self,
+        cell: tuple[float, float],
+        timezone: str,
+        start: date,
+        days: int,
+        sun: tuple[np.ndarray, np.ndarray],
+        moon: tuple[np.ndarray, np.ndarray],
+        phases: tuple[np.ndarray, np.ndarray],
+    ):
+        self.cell = cell
+        self.timezone = timezone
+        # local date of the first day
+        self.start = start
+        self.days = days
+        # (times, events) with event 1 a rising and 0 a setting
+        self.sun = sun
+        self.moon = moon
+        # (times, unwrapped phase angle in degrees)
+        self.phases = phases
+
+    def current(self, now: float) -> bool:
+        """
+        starts today, local time
+        """
+        tz = pytz.timezone(self.timezone)
+        return datetime.fromtimestamp(now, tz).date() == self.start
+
+    def local(self, seconds: float) -> datetime:
+        return datetime.fromtimestamp(seconds, pytz.timezone(self.timezone))
+
+    def next(
+        self, table: tuple[np.ndarray, np.ndarray], event: int, now: float
+    ) -> Optional[datetime]:
+        times, events = table
+        later = times[(times > now) & (events == event)]
+        return self.local(later[0]) if len(later) else None
+
+    def next_sun(self, now: float) -> tuple[Optional[datetime], Optional[datetime]]:
+        return self.next(self.sun, 1, now), self.next(self.sun, 0, now)
+
+    def next_moon(self, now: float) -> tuple[Optional[datetime], Optional[datetime]]:
+        return self.next(self.moon, 1, now), self.next(self.moon, 0, now)
+
+    def phase(self, seconds: float) -> float:
+        times, angles = self.phases
+        return float(np.interp(seconds, times, angles) % 360)
+
+    def day(self, day: date) -> tuple[Optional[datetime], Optional[datetime], float]:
+        """
+        (sunrise, sunset, moon phase at noon) on a local date
+        """
+        tz = pytz.timezone(self.timezone)
+        midnight = tz.localize(datetime.combine(day, time())).timestamp()
+        noon = tz.localize(datetime.combine(day, time(12))).timestamp()
+        times, events = self.sun
+        today = (times >= midnight) & (times < midnight + 86400)
+        rises = times[today & (events == 1)]
+        sets = times[today & (events == 0)]
+        return (
+            self.local(rises[0]) if len(rises) else None,
+            self.local(sets[0]) if len(sets) else None,
+            self.phase(noon),
+        )
+
+
+def compute(
+    cell: tuple[float, float], timezone: str, days: int, now: float = None
+) -> Almanac:
+    """
+    sun and moon events from local midnight today for days days
+    """
+    ts, e = timescale(), ephemeris()
+    tz = pytz.timezone(timezone)
+    now = now or datetime.now(pytz.UTC).timestamp()
+    start = datetime.fromtimestamp(now, tz).date()
+    midnight = tz.localize(datetime.combine(start, time()))
+
+    t0 = ts.from_datetime(midnight)
+    t1 = ts.from_datetime(midnight + timedelta(days=days + 1))
+    observer = Topos(*cell)
+
+    sun_times, sun_events = almanac.find_discrete(
+        t0, t1, almanac.sunrise_sunset(e, observer)
+    )
+    moon_times, moon_events = almanac.find_discrete(
+        t0, t1, almanac.risings_and_settings(e, e["moon"], observer)
+    )
+    samples = ts.tt_jd(t0.tt + np.arange((days + 1) * PHASE_STEPS + 1) / PHASE_STEPS)
+    angles = np.degrees(np.unwrap(almanac.moon_phase(e, samples).radians))
+
+    return Almanac(
+        cell,
+        timezone,
+        start,
+        days,
+        sun=(utc_seconds(sun_times), np.asarray(sun_events)),
+        moon=(utc_seconds(moon_times), np.asarray(moon_events)),
+        phases=(utc_seconds(samples), angles),
+    )
@@ -27,7 +27,9 @@ class ChatGPT(BaseCommand):
             )
             raise CommandLoadError(f"{self.command} missing configuration data")
 
-        self.client = OpenAI(api_key=self.api_key)
+        # point at 'python -m door.http_replay serve' to test offline
+        self.base_url = self.get_setting(str, "base_url", None)
+        self.client = OpenAI(api_key=self.api_key, base_url=self.base_url)
         self.token_count = 0
 
     def reset(self, node: str):
@@ -0,0 +1,322 @@
+from pathlib import Path
+from threading import Thread, Event
+
+from pubsub import pub
+from loguru import logger as log
+
+from .. import BaseCommand, CommandLoadError
+from ...link_stats import tracker
+from . import columnar, queries, search, sql, telemetry, track
+from .decoders import DECODERS, Record, decode_position
+from .db import create_tables
+from .sinks import SINKS, Sink, RingSink, SqliteSink, throttled, writer
+from .work_queue import WorkQueue, DROP_OLDEST, OVERFLOW_POLICIES
+
+# don't log these when they are sent directly to us
+PRIVATE_PORTNUMS = {"TEXT_MESSAGE_APP"}
+
+
+class MeshLogger(BaseCommand):
+    """
+    log positions and messages to primary channel
+    allow users to query
+    """
+
+    command = "log"
+    description = "display messages from primary channel"
+    help = (
+        "'log' for recent messages, 'log 2' for the next page\n"
+        "'log search <words>' finds old messages\n"
+        "'log batt|temp|hum|util <node> <hours>' shows a trend\n"
+        "'log queue' shows logging backlog and dropped packets\n"
+        "'log sql <select>' for admins"
+    )
+
+    # messages per 'log' reply page
+    page_size: int = 5
+
+    # the loaded MeshLogger, for the REST API
+    instance: "MeshLogger" = None
+
+    def load(self):
+        data_dir: Path = self.get_setting(Path, "data_dir")
+        self.db_file = data_dir / "mesh_logger.sqlite"
+
+        create_tables(self.db_file)
+
+        # only log packets that are not private to me
+        self.me = self.interface.getMyUser()["id"]
+
+        # which packets to decode, default is everything we have a decoder for
+        portnums = self.get_setting(str, "portnums", None)
+        if portnums:
+            self.portnums = {p.strip().upper() for p in portnums.split(",")}
+        else:
+            self.portnums = set(DECODERS.keys())
+        for portnum in self.portnums - set(DECODERS.keys()):
+            log.warning(f"No mesh_logger decoder for {portnum}")
+
+        # where decoded records go
+        self.sinks: list[Sink] = []
+        for name in self.get_setting(str, "sinks", "sqlite").split(","):
+            name = name.strip().lower()
+            if name not in SINKS:
+                log.warning(f"Unknown mesh_logger sink '{name}'")
+                continue
+            self.sinks.append(SINKS[name](self))
+
+        # recent records are always kept in memory
+        self.ring = RingSink(
+            messages=self.get_setting(int, "ring_size", 500),
+            positions=self.get_setting(int, "ring_positions", 0),
+            telemetry=self.get_setting(int, "ring_telemetry", 0),
+        )
+        self.prime_ring()
+        self.sinks.append(self.ring)
+
+        # full-text search over messages, old rows are indexed when the writer is idle
+        self.search_enabled = False
+        if self.get_setting(bool, "search", True):
+            self.search_enabled = search.create_search_index(
+                self.db_file, rebuild=self.get_setting(bool, "search_rebuild", False)
+            )
+        if self.search_enabled:
+            chunk = self.get_setting(int, "search_chunk", 500)
+            self.add_maintenance(lambda db: search.backfill(db, chunk))
+
+        # skip positions from nodes that haven't moved
+        self.filters = []
+        self.deadband = None
+        meters = self.get_setting(float, "position_min_meters", 0.0)
+        minutes = self.get_setting(float, "position_min_minutes", 0.0)
+        if meters > 0 or minutes > 0:
+            self.deadband = track.PositionDeadband(meters, int(minutes * 60))
+            self.filters.append(self.deadband)
+
+        # thin out old tracks
+        epsilon = self.get_setting(float, "track_simplify_meters", 0.0)
+        if epsilon > 0:
+            min_age = int(self.get_setting(float, "track_simplify_after_hours", 24) * 3600)
+            track_chunk = self.get_setting(int, "track_simplify_chunk", 1000)
+            self.add_maintenance(
+                throttled(
+                    lambda db: track.simplify_tracks(db, epsilon, min_age, track_chunk),
+                    3600,
+                )
+            )
+
+        # send work to a thread that writes the DB
+        # bounded so a stalled database can't use all of our memory
+        queue_size = self.get_setting(int, "queue_size", 5000)
+        if queue_size < 1:
+            # Queue(0) is unbounded, and the overflow policies need a full queue
+            log.error(f"mesh_logger queue_size must be at least 1, not {queue_size}")
+            raise CommandLoadError(f"{self.command} queue_size must be at least 1")
+        overflow = self.get_setting(str, "overflow", DROP_OLDEST)
+        if overflow not in OVERFLOW_POLICIES:
+            log.warning(f"Unknown overflow policy '{overflow}', using {DROP_OLDEST}")
+            overflow = DROP_OLDEST
+        self.work_queue = WorkQueue(
+            maxsize=queue_size,
+            overflow=overflow,
+            spill_file=data_dir / "mesh_logger.spill",
+            spill_max_bytes=self.get_setting(int, "spill_max_mb", 64) * 1024 * 1024,
+        )
+        self.shutdown_event = Event()
+        self.reported_drops = 0
+
+        thread = Thread(
+            target=writer,
+            args=(self.work_queue, self.sinks, self.shutdown_event, self.filters),
+            name="mesh_logger",
+        )
+        thread.start()
+
+        # read-only SQL for the nodes in admin_nodes
+        self.admin_nodes = {
+            n.strip()
+            for n in self.get_setting(str, "admin_nodes", "").split(",")
+            if n.strip()
+        }
+        self.sql = sql.QueryPool(
+            self.db_file,
+            size=self.get_setting(int, "sql_pool", 2),
+            max_seconds=self.get_setting(float, "sql_max_seconds", 2.0),
+            max_steps=self.get_setting(int, "sql_max_steps", 5_000_000),
+            max_rows=self.get_setting(int, "sql_max_rows", 50),
+        )
+
+        pub.subscribe(self.on_data, "meshtastic.receive")
+        MeshLogger.instance = self
+
+        # link quality is tracked in memory and flushed to SQLite from periodic()
+        self.links = tracker()
+        try:
+            self.links.restore(queries.link_stats(self.db_file))
+        except:
+            log.exception("Failed to restore link stats")
+
+    def add_maintenance(self, task):
+        """
+        run task(db) on the writer thread's SQLite connection when it is idle
+        """
+        for sink in self.sinks:
+            if isinstance(sink, SqliteSink):
+                sink.maintenance.append(task)
+
+    def prime_ring(self):
+        """
+        start with the newest history from SQLite so restarts don't empty the ring
+        """
+        try:
+            for kind, read in (
+                ("message", queries.channel_messages),
+                ("position", queries.positions),
+            ):
+                size = self.ring.rings[kind].maxlen
+                if size:
+                    self.ring.prime(kind, list(reversed(read(self.db_file, size))))
+        except:
+            log.exception("Failed to prime mesh_logger ring from SQLite")
+
+    def recent(self, kind: str, count: int, offset: int = 0) -> list[Record]:
+        """
+        newest first, from memory when we can and SQLite when we can't
+        """
+        records = self.ring.recent(kind, count, offset)
+        if len(records) == count or self.ring.complete(kind):
+            return records
+        if kind == "message":
+            return queries.channel_messages(self.db_file, count, offset)
+        if kind == "position":
+            return queries.positions(self.db_file, count, offset)
+        return records
+
+    def invoke(self, msg: str, node: str):
+        msg = msg[len(self.command) :].strip()
+        if msg[:4].lower() == "sql ":
+            if node not in self.admin_nodes:
+                return "'log sql' is for admins."
+            # a query can take a while, don't hold up other commands
+            self.run_in_thread(self.run_sql, msg[4:].strip(), node)
+            return
+
+        msg = msg.lower()
+        if msg == "queue":
+            reply = self.work_queue.status()
+            if self.deadband:
+                reply += f"\npositions skipped {self.deadband.suppressed}"
+            return reply
+        if msg.startswith("search"):
+            return self.search(msg[len("search") :].strip())
+        if msg.split(" ")[0] in telemetry.METRICS:
+            return self.trend(msg, node)
+
+        page = int(msg) if msg.isdigit() and int(msg) > 0 else 1
+        records = self.recent("message", self.page_size, (page - 1) * self.page_size)
+        if not records:
+            return "No messages logged."
+
+        reply = ""
+        for record in records:
+            timestamp = queries.from_epoch(record.rx_time).strftime("%Y-%m-%d %H:%M")
+            line = f"{timestamp} {record.item.fromId[-4:]}\n{record.item.payload}\n\n"
+            if len(reply + line) > 200:
+                break
+            reply += line
+
+        return reply.strip()
+
+    def search(self, terms: str) -> str:
+        if not self.search_enabled:
+            return "Search is not available."
+        if not terms:
+            return "Try 'log search <words>'."
+
+        results = search.search(self.db_file, terms)
+        if not results:
+            return "No messages found."
+
+        reply = ""
+        for m in results:
+            line = f"{m.timestamp.strftime('%m-%d %H:%M')} {m.fromId[-4:]}: {m.payload}\n"
+            if len(reply + line) > 200:
+                # squeeze in a shortened first result rather than nothing
+                if not reply:
+                    reply = line[:199] + "…"
+                break
+            reply += line
+        return reply.strip()
+
+    def run_sql(self, query: str, node: str):
+        try:
+            reply = sql.format_result(self.sql.run(query))
+        except sql.QueryError as e:
+            reply = f"SQL error: {e}"[:200]
+        except:
+            log.exception(f"'log sql' failed for {node}")
+            reply = "SQL failed."
+        self.send_dm(reply, node)
+
+    def trend(self, msg: str, node: str) -> str:
+        """
+        'batt', 'batt !abcd1234', 'temp abcd 48'
+        """
+        metric, *args = msg.split()
+        hours = 24.0
+        if args and args[-1].replace(".", "", 1).isdigit():
+            hours = min(float(args.pop()), 24 * 31)
+        target = self.resolve_node(args[0]) if args else node
+        if target is None:
+            return "I can't find that node. Use the short name or the '!' id."
+        return telemetry.summary(self.db_file, target, metric, hours or 24.0)
+
+    def on_data(self, packet, interface):
+        # runs on the radio thread, never let logging break it
+        try:
+            self.queue_packet(packet)
+        except:
+            log.exception("mesh_logger failed to queue packet")
+
+    def queue_packet(self, packet):
+        if "decoded" not in packet:
+            log.debug(f"'decoded' not in packet keys: {packet.keys()}")
+            return
+
+        # skip messages from the device we are connected to
+        if packet["fromId"] == self.me:
+            return
+
+        # filter before any models are built
+        portnum = packet["decoded"].get("portnum")
+        if portnum in PRIVATE_PORTNUMS and packet.get("toId") == self.me:
+            return
+
+        if portnum in self.portnums:
+            for record in DECODERS[portnum](packet):
+                self.work_queue.offer(record)
+
+        # a position can be attached to packets of other apps too
+        if (
+            portnum != "POSITION_APP"
+            and "position" in packet["decoded"]
+            and "POSITION_APP" in self.portnums
+        ):
+            for record in decode_position(packet):
+                self.work_queue.offer(record)
+
+    def periodic(self):
+        for stats in self.links.snapshot():
+            self.work_queue.offer(Record(stats.id, stats, stats.last_heard))
+
+        dropped = sum(self.work_queue.dropped.values())
+        if dropped > self.reported_drops:
+            log.warning(f"mesh_logger {self.work_queue.status()}")
+            self.reported_drops = dropped
+
+    def shutdown(self):
+        log.debug("Joining work queue..")
+        self.work_queue.join()
+        log.debug("Setting shutdown event..")
+        self.shutdown_event.set()
+        self.sql.close()
@@ -0,0 +1,279 @@
+"""
+Telemetry as fixed-width column files, one per node, metric and time segment.
+
+    data_dir/mesh_logger_columns/<node>/<table>.<column>/<start>-<end>.col
+
+Each file is an append-only array of (int64 epoch seconds, float64 value)
+records. Readers memory-map the files, so a range scan of a sorted
+segment is a view of the file with no copying. A new segment starts every
+segment_hours, old segments are deleted after keep_days.
+
+Export for offline analysis with:
+
+    python -m door.commands.mesh_logger.columnar data/mesh_logger_columns out.csv
+"""
+
+import argparse
+import csv
+from collections.abc import Iterator
+from pathlib import Path
+import sys
+import time
+from typing import Optional
+
+import numpy as np
+from loguru import logger as log
+
+from ...models import DeviceMetric, EnvironmentMetric
+from .decoders import Record
+from .sinks import SINKS, Sink
+
+DTYPE = np.dtype([("t", "<i8"), ("v", "<f8")])
+
+# model -> table name used in metric names, the same as the SQLite tables
+TABLES = {DeviceMetric: "device_metric", EnvironmentMetric: "environment_metric"}
+
+# fields that are not measurements
+SKIP_FIELDS = {"id", "time"}
+
+
+def segment_path(root: Path, node: str, metric: str, start: int, seconds: int) -> Path:
+    return root / node / metric / f"{start}-{start + seconds}.col"
+
+
+def segment_range(path: Path) -> tuple[int, int]:
+    start, end = path.stem.split("-")
+    return int(start), int(end)
+
+
+class ColumnarSink(Sink):
+    name = "columnar"
+
+    def __init__(self, root: Path, segment_hours: float = 24, keep_days: float = 0):
+        self.root = root
+        self.segment_seconds = max(int(segment_hours * 3600), 60)
+        self.keep_seconds = int(keep_days * 86400)
+        self.last_prune = 0
+
+        # segment file -> records waiting for the next flush
+        self.pending: dict[Path, list[tuple[int, float]]] = {}
+
+    def open(self):
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def write(self, record: Record):
+        table = TABLES.get(type(record.item))
+        if table is None:
+            return
+
+        start = record.rx_time - record.rx_time % self.segment_seconds
+        for field, value in record.item.model_dump(exclude_none=True).items():
+            if field in SKIP_FIELDS:
+                continue
+            path = segment_path(
+                self.root, record.node, f"{table}.{field}", start, self.segment_seconds
+            )
+            self.pending.setdefault(path, []).append((record.rx_time, value))
+
+    def flush(self):
+        # taken out before writing, so a failed path is dropped rather than
+        # written again with the next batch, and the others are still written
+        while self.pending:
+            path, rows = self.pending.popitem()
+            try:
+                path.parent.mkdir(parents=True, exist_ok=True)
+                with path.open("ab") as fd:
+                    fd.write(np.array(rows, dtype=DTYPE).tobytes())
+            except:
+                log.exception(f"Dropped {len(rows)} column records for {path}")
+
+    def idle(self):
+        # hourly is plenty for deleting whole days
+        if not self.keep_seconds or time.monotonic() - self.last_prune < 3600:
+            return
+        self.last_prune = time.monotonic()
+
+        cutoff = time.time() - self.keep_seconds
+        for path in self.root.glob("*/*/*.col"):
+            if segment_range(path)[1] < cutoff:
+                path.unlink()
+                log.debug(f"Removed old column segment {path}")
+
+    def close(self):
+        self.flush()
+
+
+SINKS["columnar"] = lambda ml: ColumnarSink(
+    ml.get_setting(Path, "data_dir") / "mesh_logger_columns",
+    ml.get_setting(float, "columnar_segment_hours", 24),
+    ml.get_setting(float, "columnar_keep_days", 0),
+)
+
+
+def open_segment(path: Path) -> np.ndarray:
+    """
+    memory-map a segment read-only, ignoring a partly written last record
+    """
+    count = path.stat().st_size // DTYPE.itemsize
+    if count == 0:
+        return np.empty(0, dtype=DTYPE)
+    return np.memmap(path, dtype=DTYPE, mode="r", shape=(count,))
+
+
+def segments(root: Path, node: str, metric: str, start: int, end: int) -> list[Path]:
+    """
+    segment files that may hold records in [start, end), oldest first
+    """
+    paths = []
+    for path in (root / node / metric).glob("*.col"):
+        first, last = segment_range(path)
+        if first < end and last > start:
+            paths.append(path)
+    return sorted(paths, key=lambda p: segment_range(p)[0])
+
+
+def scan_segment(data: np.ndarray, start: int, end: int) -> np.ndarray:
+    """
+    records in [start, end), a view when the segment is in time order
+    """
+    t = data["t"]
+    if len(t) < 2 or np.all(t[1:] >= t[:-1]):
+        return data[np.searchsorted(t, start) : np.searchsorted(t, end)]
+    # late records (like ones from the spill file) leave a segment unsorted
+    selected = data[(t >= start) & (t < end)]
+    return selected[np.argsort(selected["t"], kind="stable")]
+
+
+def scan(
+    root: Path, node: str, metric: str, start: int, end: int
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    (epoch seconds, values) for node and metric, like telemetry.read_series
+    """
+    parts = [
+        scan_segment(open_segment(path), start, end)
+        for path in segments(root, node, metric, start, end)
+    ]
+    if not parts:
+        return np.empty(0, dtype=np.int64), np.empty(0)
+    data = parts[0] if len(parts) == 1 else np.concatenate(parts)
+    return data["t"], data["v"]
+
+
+def aggregate(root: Path, node: str, metric: str, start: int, end: int) -> dict:
+    """
+    count, mean, min and max without building one array of the whole range
+    """
+    count, total, low, high = 0, 0.0, np.inf, -np.inf
+    for path in segments(root, node, metric, start, end):
+        v = scan_segment(open_segment(path), start, end)["v"]
+        if len(v):
+            count += len(v)
+            total += float(v.sum())
+            low = min(low, float(v.min()))
+            high = max(high, float(v.max()))
+    if count == 0:
+        return {"count": 0, "mean": None, "min": None, "max": None}
+    return {"count": count, "mean": total / count, "min": low, "max": high}
+
+
+def series_names(root: Path) -> Iterator[tuple[str, str]]:
+    """
+    every (node, metric) in the store
+    """
+    for node in sorted(p for p in root.iterdir() if p.is_dir()):
+        for metric in sorted(p for p in node.iterdir() if p.is_dir()):
+            yield node.name, metric.name
+
+
+def export(
+    root: Path,
+    out: Path,
+    format: str = "csv",
+    nodes: Optional[list[str]] = None,
+    metrics: Optional[list[str]] = None,
+    start: int = 0,
+    end: int = 2**62,
+) -> int:
+    """
+    write (node, metric, time, value) rows to CSV or Parquet, one series at a time
+    returns the number of rows written
+    """
+    selected = [
+        (node, metric)
+        for node, metric in series_names(root)
+        if (not nodes or node in nodes) and (not metrics or metric in metrics)
+    ]
+
+    rows = 0
+    if format == "csv":
+        with out.open("w", newline="") as fd:
+            output = csv.writer(fd)
+            output.writerow(["node", "metric", "time", "value"])
+            for node, metric in selected:
+                t, v = scan(root, node, metric, start, end)
+                output.writerows((node, metric, int(a), float(b)) for a, b in zip(t, v))
+                rows += len(t)
+
+    elif format == "parquet":
+        # optional, only needed for this export
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        schema = pa.schema(
+            [
+                ("node", pa.string()),
+                ("metric", pa.string()),
+                ("time", pa.timestamp("s", tz="UTC")),
+                ("value", pa.float64()),
+            ]
+        )
+        with pq.ParquetWriter(out, schema) as output:
+            for node, metric in selected:
+                t, v = scan(root, node, metric, start, end)
+                if len(t) == 0:
+                    continue
+                output.write_table(
+                    pa.table(
+                        [
+                            pa.array([node] * len(t)),
+                            pa.array([metric] * len(t)),
+                            pa.array(np.asarray(t), pa.timestamp("s", tz="UTC")),
+                            pa.array(np.asarray(v)),
+                        ],
+                        schema=schema,
+                    )
+                )
+                rows += len(t)
+    else:
+        raise ValueError(f"Unknown export format '{format}'")
+
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+        description="Export mesh_logger column files to CSV or Parquet.",
+    )
+    parser.add_argument("root", type=Path, help="data_dir/mesh_logger_columns")
+    parser.add_argument("out", type=Path, help="output file")
+    parser.add_argument("--format", choices=["csv", "parquet"], default="csv")
+    parser.add_argument("--node", action="append", help="only this node (repeatable)")
+    parser.add_argument(
+        "--metric", action="append", help="only this metric, like device_metric.voltage"
+    )
+    parser.add_argument("--hours", type=float, default=None, help="only the last hours")
+    args = parser.parse_args()
+
+    start = int(time.time() - args.hours * 3600) if args.hours else 0
+    try:
+        rows = export(args.root, args.out, args.format, args.node, args.metric, start)
+    except ImportError:
+        log.error("Parquet export needs pyarrow, 'pip install pyarrow'")
+        sys.exit(1)
+    log.info(f"Wrote {rows} rows to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
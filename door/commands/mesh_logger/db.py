@@ -0,0 +1,351 @@
+"""
+SQLite storage for mesh_logger records.
+"""
+
+from collections.abc import Callable
+import datetime
+import json
+from pathlib import Path
+import sqlite3
+from sqlite3 import Cursor
+
+from loguru import logger as log
+import pytz
+from pydantic import BaseModel
+
+from ...models import (
+    UserInfo,
+    Message,
+    Position,
+    DeviceMetric,
+    EnvironmentMetric,
+    Neighbor,
+)
+from ...link_stats import LinkStats
+from .decoders import Record, MODELS
+
+DDL_FILE = Path(__file__).with_name("mesh_logger.sql")
+
+Writer = Callable[[Cursor, Record], None]
+
+# model -> function that inserts a record of that model
+WRITERS: dict[type[BaseModel], Writer] = {}
+
+
+def writer(model: type[BaseModel]):
+    """
+    register a function that stores records of model in SQLite
+    plugins adding a decoder should add a writer (and a table) too
+    """
+
+    def register(fn: Writer) -> Writer:
+        WRITERS[model] = fn
+        # anything we can write can be spilled
+        MODELS[model.__name__] = model
+        return fn
+
+    return register
+
+
+def create_tables(db_file: Path):
+    db = sqlite3.connect(db_file)
+    db.executescript(DDL_FILE.open("r").read())
+    db.commit()
+    migrate_message_id(db)
+    if db.execute("SELECT COUNT(*) FROM node_latest").fetchone()[0] == 0:
+        populate_latest(db.cursor())
+        db.commit()
+    db.close()
+
+
+def migrate_message_id(db: sqlite3.Connection):
+    """
+    give message tables from before message.id an INTEGER PRIMARY KEY,
+    keeping the implicit rowids as ids
+    """
+    columns = [row[1] for row in db.execute("PRAGMA table_info(message)")]
+    if "id" in columns:
+        return
+    log.info("Adding an id column to the message table..")
+    # dropping message drops its triggers, search.py rebuilds the index
+    db.executescript(
+        """
+        BEGIN;
+        CREATE TABLE message_new (
+            id INTEGER PRIMARY KEY,
+            fromId TEXT,
+            toId TEXT,
+            timestamp INTEGER,
+            payload TEXT,
+            FOREIGN KEY(fromId) REFERENCES node(id),
+            FOREIGN KEY(toId) REFERENCES node(id)
+        );
+        INSERT INTO message_new (id, fromId, toId, timestamp, payload)
+        SELECT rowid, fromId, toId, timestamp, payload FROM message;
+        DROP TABLE message;
+        ALTER TABLE message_new RENAME TO message;
+        COMMIT;
+        """
+    )
+
+
+def insert_node(cursor: Cursor, node: str):
+    cursor.execute("INSERT OR IGNORE INTO node VALUES (?)", (node,))
+
+
+def sql_time(rx_time: int) -> str:
+    """
+    same text as SQLite's datetime(rx_time, 'unixepoch')
+    """
+    return datetime.datetime.fromtimestamp(rx_time, pytz.UTC).strftime(
+        "%Y-%m-%d %H:%M:%S"
+    )
+
+
+def upsert_latest(
+    cursor: Cursor, node: str, time_column: str, timestamp: str, **values
+):
+    """
+    set values (and time_column) on the node's node_latest row,
+    unless that row already has something newer
+    """
+    columns = [time_column, *values]
+    newer = f"excluded.{time_column} >= COALESCE(node_latest.{time_column}, '')"
+    updates = ", ".join(
+        f"{c} = CASE WHEN {newer} THEN excluded.{c} ELSE node_latest.{c} END"
+        for c in columns
+    )
+    cursor.execute(
+        (
+            f"INSERT INTO node_latest (node, last_heard, {', '.join(columns)}) "
+            f"VALUES (?, ?, {', '.join('?' for _ in columns)}) "
+            "ON CONFLICT(node) DO UPDATE SET "
+            "last_heard = MAX("
+            "COALESCE(node_latest.last_heard, ''), excluded.last_heard"
+            "), "
+            f"{updates}"
+        ),
+        (node, timestamp, timestamp, *values.values()),
+    )
+
+
+# for filling node_latest from history: table -> (time column, value columns)
+LATEST_SOURCES = {
+    "node_info": ("node_info_time", ["longName", "shortName", "hwModel"]),
+    "position": ("position_time", ["latitude", "longitude", "altitude"]),
+    "device_metric": (
+        "device_metric_time",
+        ["batteryLevel", "channelUtilization", "airUtilTx", "uptimeSeconds"],
+    ),
+    "environment_metric": (
+        "environment_metric_time",
+        ["temperature", "relative_humidity", "barometric_pressure"],
+    ),
+}
+
+
+def populate_latest(cursor: Cursor):
+    """
+    fill node_latest from the history tables, for databases older than it
+    """
+    for table, (time_column, columns) in LATEST_SOURCES.items():
+        # SQLite takes bare columns from the row that has the MAX()
+        rows = cursor.execute(
+            f"SELECT node, MAX(timestamp), {', '.join(columns)} "
+            f"FROM {table} GROUP BY node"
+        ).fetchall()
+        for node, timestamp, *values in rows:
+            upsert_latest(
+                cursor, node, time_column, timestamp, **dict(zip(columns, values))
+            )
+
+    rows = cursor.execute(
+        "SELECT fromId, MAX(timestamp) FROM message GROUP BY fromId"
+    ).fetchall()
+    for node, timestamp in rows:
+        upsert_latest(cursor, node, "message_time", timestamp)
+
+
+@writer(Message)
+def insert_message(cursor: Cursor, record: Record):
+    message: Message = record.item
+    # the recipient of this message may not already be in our node table
+    insert_node(cursor, message.toId)
+    cursor.execute(
+        (
+            "INSERT INTO message (timestamp, fromId, toId, payload) "
+            "VALUES (datetime(?, 'unixepoch'), ?, ?, ?)"
+        ),
+        (record.rx_time, message.fromId, message.toId, message.payload),
+    )
+    upsert_latest(cursor, message.fromId, "message_time", sql_time(record.rx_time))
+
+
+@writer(UserInfo)
+def insert_node_info(cursor: Cursor, record: Record):
+    node_info: UserInfo = record.item
+    cursor.execute(
+        (
+            "INSERT INTO node_info (timestamp, node, longName, shortName, macaddr, hwModel) "
+            "VALUES (datetime(?, 'unixepoch'), ?, ?, ?, ?, ?)"
+        ),
+        (
+            record.rx_time,
+            node_info.id,
+            node_info.longName,
+            node_info.shortName,
+            node_info.macaddr,
+            node_info.hwModel,
+        ),
+    )
+    upsert_latest(
+        cursor,
+        node_info.id,
+        "node_info_time",
+        sql_time(record.rx_time),
+        longName=node_info.longName,
+        shortName=node_info.shortName,
+        hwModel=node_info.hwModel,
+    )
+
+
+@writer(Position)
+def insert_position(cursor: Cursor, record: Record):
+    position: Position = record.item
+    cursor.execute(
+        (
+            "INSERT INTO position (timestamp, node, latitude, longitude, altitude) "
+            "VALUES (datetime(?, 'unixepoch'), ?, ?, ?, ?)"
+        ),
+        (
+            record.rx_time,
+            position.id,
+            position.latitude,
+            position.longitude,
+            position.altitude,
+        ),
+    )
+    upsert_latest(
+        cursor,
+        position.id,
+        "position_time",
+        sql_time(record.rx_time),
+        latitude=position.latitude,
+        longitude=position.longitude,
+        altitude=position.altitude,
+    )
+
+
+@writer(DeviceMetric)
+def insert_device_metric(cursor: Cursor, record: Record):
+    device_metric: DeviceMetric = record.item
+    cursor.execute(
+        (
+            "INSERT INTO device_metric "
+            "(timestamp, node, batteryLevel, channelUtilization, airUtilTx, uptimeSeconds) "
+            "VALUES (datetime(?, 'unixepoch'), ?, ?, ?, ?, ?);"
+        ),
+        (
+            record.rx_time,
+            device_metric.id,
+            device_metric.batteryLevel,
+            device_metric.channelUtilization,
+            device_metric.airUtilTx,
+            device_metric.uptimeSeconds,
+        ),
+    )
+    upsert_latest(
+        cursor,
+        device_metric.id,
+        "device_metric_time",
+        sql_time(record.rx_time),
+        batteryLevel=device_metric.batteryLevel,
+        voltage=device_metric.voltage,
+        channelUtilization=device_metric.channelUtilization,
+        airUtilTx=device_metric.airUtilTx,
+        uptimeSeconds=device_metric.uptimeSeconds,
+    )
+
+
+@writer(EnvironmentMetric)
+def insert_environment_metric(cursor: Cursor, record: Record):
+    em: EnvironmentMetric = record.item
+    cursor.execute(
+        (
+            "INSERT INTO environment_metric ("
+            "timestamp, node, temperature, relative_humidity, barometric_pressure, "
+            "gas_resistance, voltage, current, iaq, distance, "
+            "lux, white_lux, ir_lux, uv_lux, wind_direction, "
+            "wind_speed, weight, wind_gust, wind_lull"
+            ") VALUES ("
+            "datetime(?, 'unixepoch'), ?, ?, ?, ?, "
+            "?, ?, ?, ?, ?,"
+            "?, ?, ?, ?, ?,"
+            "?, ?, ?, ?"
+            ")"
+        ),
+        (
+            record.rx_time,
+            em.id,
+            em.temperature,
+            em.relative_humidity,
+            em.barometric_pressure,
+            em.gas_resistance,
+            em.voltage,
+            em.current,
+            em.iaq,
+            em.distance,
+            em.lux,
+            em.white_lux,
+            em.ir_lux,
+            em.uv_lux,
+            em.wind_direction,
+            em.wind_speed,
+            em.weight,
+            em.wind_gust,
+            em.wind_lull,
+        ),
+    )
+    upsert_latest(
+        cursor,
+        em.id,
+        "environment_metric_time",
+        sql_time(record.rx_time),
+        temperature=em.temperature,
+        relative_humidity=em.relative_humidity,
+        barometric_pressure=em.barometric_pressure,
+    )
+
+
+@writer(Neighbor)
+def insert_neighbor(cursor: Cursor, record: Record):
+    neighbor: Neighbor = record.item
+    insert_node(cursor, neighbor.neighbor)
+    cursor.execute(
+        (
+            "INSERT INTO neighbor (timestamp, node, neighbor, snr) "
+            "VALUES (datetime(?, 'unixepoch'), ?, ?, ?)"
+        ),
+        (record.rx_time, neighbor.id, neighbor.neighbor, neighbor.snr),
+    )
+
+
+@writer(LinkStats)
+def upsert_link_stats(cursor: Cursor, record: Record):
+    stats: LinkStats = record.item
+    cursor.execute(
+        (
+            "INSERT OR REPLACE INTO link_stats "
+            "(node, timestamp, last_heard, packets, packets_per_hour, snr, rssi, hops) "
+            "VALUES (?, datetime(), datetime(?, 'unixepoch'), ?, ?, ?, ?, ?)"
+        ),
+        (
+            stats.id,
+            stats.last_heard,
+            stats.packets,
+            stats.packets_per_hour,
+            stats.snr,
+            stats.rssi,
+            json.dumps(stats.hops),
+        ),
+    )
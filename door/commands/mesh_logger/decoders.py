@@ -0,0 +1,135 @@
+"""
+Turn received packets into records for the writer thread.
+
+Decoders are registered by portnum. A plugin can add one for a portnum
+we don't handle yet:
+
+    from door.commands.mesh_logger.decoders import Record, decoder
+
+    @decoder("TRACEROUTE_APP", MyRouteModel)
+    def decode_traceroute(packet: dict) -> Iterator[Record]:
+        yield Record(packet["fromId"], MyRouteModel(...), rx_time(packet))
+
+MeshLogger only calls a decoder after the packet passed its filters, so
+packets we don't care about never build a pydantic model.
+"""
+
+import time
+from collections.abc import Callable, Iterator
+from typing import NamedTuple
+
+from pydantic import BaseModel
+
+from ...models import (
+    UserInfo,
+    Message,
+    Position,
+    DeviceMetric,
+    EnvironmentMetric,
+    Neighbor,
+)
+
+
+class Record(NamedTuple):
+    """
+    one decoded item on its way to the sinks
+    """
+
+    # the node this record is about
+    node: str
+    item: BaseModel
+    # when the packet was received, epoch seconds
+    rx_time: int
+
+
+# toId of packets sent to the channel
+BROADCAST_ID = "^all"
+
+Decoder = Callable[[dict], Iterator[Record]]
+
+# portnum -> decoder
+DECODERS: dict[str, Decoder] = {}
+
+# model name -> model, used to restore records spilled to disk
+MODELS: dict[str, type[BaseModel]] = {}
+
+
+def decoder(portnum: str, *models: type[BaseModel]):
+    """
+    register a function that yields records for packets on portnum
+    """
+
+    def register(fn: Decoder) -> Decoder:
+        DECODERS[portnum] = fn
+        for model in models:
+            MODELS[model.__name__] = model
+        return fn
+
+    return register
+
+
+def rx_time(packet: dict) -> int:
+    return packet.get("rxTime") or int(time.time())
+
+
+def node_id(num: int) -> str:
+    """
+    node numbers inside payloads are integers, everywhere else we use '!abcd1234'
+    """
+    return f"!{num:08x}"
+
+
+@decoder("TELEMETRY_APP", DeviceMetric, EnvironmentMetric)
+def decode_telemetry(packet: dict) -> Iterator[Record]:
+    telemetry = packet["decoded"].get("telemetry", {})
+    if "deviceMetrics" in telemetry:
+        metric = DeviceMetric(**telemetry["deviceMetrics"])
+        metric.id = packet["fromId"]
+        yield Record(packet["fromId"], metric, rx_time(packet))
+    if "environmentMetrics" in telemetry:
+        metric = EnvironmentMetric(**telemetry["environmentMetrics"])
+        metric.id = packet["fromId"]
+        yield Record(packet["fromId"], metric, rx_time(packet))
+
+
+@decoder("NODEINFO_APP", UserInfo)
+def decode_node_info(packet: dict) -> Iterator[Record]:
+    node_info = UserInfo(**packet["decoded"]["user"])
+    node_info.id = packet["fromId"]
+    yield Record(packet["fromId"], node_info, rx_time(packet))
+
+
+@decoder("TEXT_MESSAGE_APP", Message)
+def decode_text_message(packet: dict) -> Iterator[Record]:
+    message = Message(
+        fromId=packet["fromId"],
+        toId=packet["toId"],
+        payload=packet["decoded"]["payload"],
+    )
+    yield Record(packet["fromId"], message, rx_time(packet))
+
+
+@decoder("POSITION_APP", Position)
+def decode_position(packet: dict) -> Iterator[Record]:
+    pos = packet["decoded"].get("position", {})
+    if "latitude" in pos and "longitude" in pos:
+        position = Position(
+            fromId=packet["fromId"],
+            latitude=pos["latitude"],
+            longitude=pos["longitude"],
+            altitude=pos.get("altitude", None),
+            time=pos.get("time", None),
+        )
+        yield Record(packet["fromId"], position, rx_time(packet))
+
+
+@decoder("NEIGHBORINFO_APP", Neighbor)
+def decode_neighbor_info(packet: dict) -> Iterator[Record]:
+    info = packet["decoded"].get("neighborinfo", {})
+    for n in info.get("neighbors", []):
+        if "nodeId" not in n:
+            continue
+        neighbor = Neighbor(
+            id=packet["fromId"], neighbor=node_id(n["nodeId"]), snr=n.get("snr")
+        )
+        yield Record(packet["fromId"], neighbor, rx_time(packet))
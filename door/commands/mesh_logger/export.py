@@ -0,0 +1,245 @@
+"""
+Stream a mesh_logger table out as gzip NDJSON, CSV or Parquet.
+
+Rows are read a chunk at a time inside one read transaction, so an export
+sees a consistent WAL snapshot, uses constant memory however big the table
+is, and never blocks the writer thread.
+
+    python -m door.commands.mesh_logger.export data/mesh_logger.sqlite position \\
+        --since 2024-06-01 --format csv > positions.csv
+"""
+
+import argparse
+import csv
+import datetime
+import io
+import json
+from collections.abc import Iterator
+from pathlib import Path
+import sys
+import zlib
+from typing import Optional
+
+import pytz
+from loguru import logger as log
+
+from .db import sql_time
+from .queries import connect
+
+# tables that can be exported -> (time column, node column)
+EXPORT_TABLES = {
+    "node": (None, "id"),
+    "node_info": ("timestamp", "node"),
+    "node_latest": ("last_heard", "node"),
+    "message": ("timestamp", "fromId"),
+    "position": ("timestamp", "node"),
+    "device_metric": ("timestamp", "node"),
+    "environment_metric": ("timestamp", "node"),
+    "neighbor": ("timestamp", "node"),
+    "link_stats": ("last_heard", "node"),
+}
+
+# format -> (media type, file extension)
+FORMATS = {
+    "ndjson": ("application/x-ndjson", "ndjson.gz"),
+    "csv": ("text/csv", "csv"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+}
+
+
+def epoch(value: datetime.datetime) -> int:
+    """
+    times without a zone are UTC, like the database
+    """
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=pytz.UTC)
+    return int(value.timestamp())
+
+
+def read_chunks(
+    db_file: Path,
+    table: str,
+    start: Optional[datetime.datetime] = None,
+    end: Optional[datetime.datetime] = None,
+    node: Optional[str] = None,
+    chunk: int = 5000,
+) -> tuple[list[tuple[str, str]], Iterator[list[tuple]]]:
+    """
+    ([(column, declared type)], chunks of rows) for table, in rowid order
+    """
+    if table not in EXPORT_TABLES:
+        raise ValueError(f"Unknown table '{table}'")
+    time_column, node_column = EXPORT_TABLES[table]
+
+    where, params = [], []
+    if start and time_column:
+        where.append(f"{time_column} >= ?")
+        params.append(sql_time(epoch(start)))
+    if end and time_column:
+        where.append(f"{time_column} < ?")
+        params.append(sql_time(epoch(end)))
+    if node:
+        where.append(f"{node_column} = ?")
+        params.append(node)
+    query = f"SELECT * FROM {table}"
+    if where:
+        query += " WHERE " + " AND ".join(where)
+    query += " ORDER BY rowid"
+
+    db = connect(db_file)
+    columns = [
+        (row[1], row[2].upper())
+        for row in db.execute(f"PRAGMA table_info({table})")
+    ]
+
+    def chunks():
+        try:
+            # one read transaction is one snapshot for the whole export
+            db.execute("BEGIN")
+            cursor = db.execute(query, params)
+            while rows := cursor.fetchmany(chunk):
+                yield rows
+        finally:
+            db.rollback()
+            db.close()
+
+    return columns, chunks()
+
+
+Columns = list[tuple[str, str]]
+Chunks = Iterator[list[tuple]]
+
+
+def ndjson_gzip(columns: Columns, chunks: Chunks) -> Iterator[bytes]:
+    names = [name for name, _ in columns]
+    # wbits 31 writes a gzip header and trailer
+    gzip = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for rows in chunks:
+        text = "".join(json.dumps(dict(zip(names, row))) + "\n" for row in rows)
+        data = gzip.compress(text.encode("utf-8"))
+        if data:
+            yield data
+    yield gzip.flush()
+
+
+def csv_text(columns: Columns, chunks: Chunks) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    output = csv.writer(buffer)
+    output.writerow([name for name, _ in columns])
+    for rows in chunks:
+        output.writerows(rows)
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+
+
+class Drain(io.RawIOBase):
+    """
+    write-only file that hands back what was written since the last take()
+    """
+
+    def __init__(self):
+        self.parts: list[bytes] = []
+        self.position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self.parts.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.position
+
+    def take(self) -> bytes:
+        data = b"".join(self.parts)
+        self.parts.clear()
+        return data
+
+
+def parquet(columns: Columns, chunks: Chunks) -> Iterator[bytes]:
+    # optional, only needed for this format
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    def arrow_type(declared: str):
+        if "INT" in declared:
+            return pa.int64()
+        if declared in ("REAL", "FLOAT", "DOUBLE"):
+            return pa.float64()
+        return pa.string()
+
+    schema = pa.schema([(name, arrow_type(declared)) for name, declared in columns])
+    drain = Drain()
+    with pq.ParquetWriter(drain, schema) as output:
+        for rows in chunks:
+            # one row group per chunk
+            output.write_table(
+                pa.Table.from_pylist(
+                    [dict(zip(schema.names, row)) for row in rows], schema=schema
+                )
+            )
+            yield drain.take()
+    yield drain.take()
+
+
+# format -> function turning chunks of rows into bytes
+ENCODERS = {"ndjson": ndjson_gzip, "csv": csv_text, "parquet": parquet}
+
+
+def stream(
+    db_file: Path,
+    table: str,
+    format: str = "ndjson",
+    start: Optional[datetime.datetime] = None,
+    end: Optional[datetime.datetime] = None,
+    node: Optional[str] = None,
+    chunk: int = 5000,
+) -> Iterator[bytes]:
+    """
+    the export as a series of byte strings
+    """
+    if format not in ENCODERS:
+        raise ValueError(f"Unknown export format '{format}'")
+    if format == "parquet":
+        # fail before anything is sent
+        import pyarrow
+    columns, chunks = read_chunks(db_file, table, start, end, node, chunk)
+    return ENCODERS[format](columns, chunks)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+        description="Export a mesh_logger table.",
+    )
+    parser.add_argument("db_file", type=Path, help="data_dir/mesh_logger.sqlite")
+    parser.add_argument("table", choices=list(EXPORT_TABLES))
+    parser.add_argument("--format", choices=list(FORMATS), default="ndjson")
+    parser.add_argument("--out", type=Path, default=None, help="file, default stdout")
+    parser.add_argument("--since", type=datetime.datetime.fromisoformat, default=None)
+    parser.add_argument("--until", type=datetime.datetime.fromisoformat, default=None)
+    parser.add_argument("--node", default=None, help="only rows about this node")
+    args = parser.parse_args()
+
+    try:
+        data = stream(
+            args.db_file, args.table, args.format, args.since, args.until, args.node
+        )
+    except ImportError:
+        log.error("Parquet export needs pyarrow, 'pip install pyarrow'")
+        sys.exit(1)
+
+    out = args.out.open("wb") if args.out else sys.stdout.buffer
+    try:
+        for part in data:
+            out.write(part)
+    finally:
+        if args.out:
+            out.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -2,7 +2,14 @@ CREATE TABLE IF NOT EXISTS node (
     id TEXT PRIMARY KEY
 );
 
+-- bookkeeping for background maintenance
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value
+);
+
 CREATE TABLE IF NOT EXISTS message (
+    id INTEGER PRIMARY KEY,
     fromId TEXT,
     toId TEXT,
     timestamp INTEGER,
@@ -68,6 +75,60 @@ CREATE TABLE IF NOT EXISTS environment_metric (
     FOREIGN KEY(node) REFERENCES node(id)
 );
 
+-- running link quality per node, flushed from memory
+CREATE TABLE IF NOT EXISTS link_stats (
+    node TEXT PRIMARY KEY,
+    timestamp TEXT,
+    last_heard TEXT,
+    packets INTEGER,
+    packets_per_hour INTEGER,
+    snr REAL,
+    rssi REAL,
+    -- JSON list of packet counts by hops away
+    hops TEXT,
+    FOREIGN KEY(node) REFERENCES node(id)
+);
+
+-- newest value of everything per node, upserted with each insert
+CREATE TABLE IF NOT EXISTS node_latest (
+    node TEXT PRIMARY KEY,
+    last_heard TEXT,
+    longName TEXT,
+    shortName TEXT,
+    hwModel TEXT,
+    node_info_time TEXT,
+    latitude REAL,
+    longitude REAL,
+    altitude INTEGER,
+    position_time TEXT,
+    batteryLevel REAL,
+    voltage REAL,
+    channelUtilization REAL,
+    airUtilTx REAL,
+    uptimeSeconds REAL,
+    device_metric_time TEXT,
+    temperature REAL,
+    relative_humidity REAL,
+    barometric_pressure REAL,
+    environment_metric_time TEXT,
+    message_time TEXT,
+    FOREIGN KEY(node) REFERENCES node(id)
+);
+
+-- telemetry history is read by node and time window
+CREATE INDEX IF NOT EXISTS device_metric_node_time ON device_metric (node, timestamp);
+CREATE INDEX IF NOT EXISTS environment_metric_node_time ON environment_metric (node, timestamp);
+
+CREATE TABLE IF NOT EXISTS neighbor (
+    id INTEGER PRIMARY KEY,
+    node TEXT,
+    timestamp TEXT,
+    neighbor TEXT,
+    snr REAL,
+    FOREIGN KEY(node) REFERENCES node(id),
+    FOREIGN KEY(neighbor) REFERENCES node(id)
+);
+
 
 
 -- INSERT INTO node VALUES ('abc');
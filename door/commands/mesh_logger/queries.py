@@ -0,0 +1,178 @@
+"""
+Read logged data back out of SQLite for commands and the REST API.
+
+Everything here opens its own read-only connection, the writer thread
+owns the only read-write one.
+"""
+
+import datetime
+import json
+from pathlib import Path
+import sqlite3
+from typing import Optional
+
+import pytz
+from pydantic import BaseModel, field_validator
+
+from ...link_stats import LinkStats
+from ...models import Message, Position
+from .decoders import Record, BROADCAST_ID
+
+
+class LoggedMessage(BaseModel):
+    timestamp: datetime.datetime
+    fromId: str
+    toId: str
+    payload: str
+
+
+class LoggedPosition(BaseModel):
+    timestamp: datetime.datetime
+    node: str
+    latitude: float
+    longitude: float
+    altitude: Optional[int] = None
+
+
+class NodeLatest(BaseModel):
+    """
+    newest value of each field, with when it was heard
+    """
+
+    node: str
+    last_heard: Optional[datetime.datetime] = None
+    longName: Optional[str] = None
+    shortName: Optional[str] = None
+    hwModel: Optional[str] = None
+    node_info_time: Optional[datetime.datetime] = None
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
+    altitude: Optional[int] = None
+    position_time: Optional[datetime.datetime] = None
+    batteryLevel: Optional[float] = None
+    voltage: Optional[float] = None
+    channelUtilization: Optional[float] = None
+    airUtilTx: Optional[float] = None
+    uptimeSeconds: Optional[float] = None
+    device_metric_time: Optional[datetime.datetime] = None
+    temperature: Optional[float] = None
+    relative_humidity: Optional[float] = None
+    barometric_pressure: Optional[float] = None
+    environment_metric_time: Optional[datetime.datetime] = None
+    message_time: Optional[datetime.datetime] = None
+
+    @field_validator("*", mode="before")
+    @classmethod
+    def utc(cls, value, info):
+        if info.field_name.endswith(("_time", "_heard")) and isinstance(value, str):
+            return parse_timestamp(value)
+        return value
+
+
+def connect(db_file: Path) -> sqlite3.Connection:
+    return sqlite3.connect(f"file:{db_file}?mode=ro", uri=True)
+
+
+def parse_timestamp(value: str) -> datetime.datetime:
+    """
+    timestamps are stored as SQLite datetime() text in UTC
+    """
+    return datetime.datetime.fromisoformat(value).replace(tzinfo=pytz.UTC)
+
+
+def to_epoch(value: str) -> int:
+    return int(parse_timestamp(value).timestamp())
+
+
+def from_epoch(value: int) -> datetime.datetime:
+    return datetime.datetime.fromtimestamp(value, pytz.UTC)
+
+
+def message_from_record(record: Record) -> LoggedMessage:
+    return LoggedMessage(
+        timestamp=from_epoch(record.rx_time), **record.item.model_dump()
+    )
+
+
+def position_from_record(record: Record) -> LoggedPosition:
+    return LoggedPosition(
+        timestamp=from_epoch(record.rx_time),
+        node=record.node,
+        latitude=record.item.latitude,
+        longitude=record.item.longitude,
+        altitude=record.item.altitude,
+    )
+
+
+def channel_messages(db_file: Path, count: int, offset: int = 0) -> list[Record]:
+    """
+    newest first
+    """
+    db = connect(db_file)
+    rows = db.execute(
+        (
+            "SELECT timestamp, fromId, toId, payload FROM message "
+            "WHERE toId = ? ORDER BY rowid DESC LIMIT ? OFFSET ?"
+        ),
+        (BROADCAST_ID, count, offset),
+    ).fetchall()
+    db.close()
+    return [
+        Record(
+            fromId,
+            Message(fromId=fromId, toId=toId, payload=payload),
+            to_epoch(timestamp),
+        )
+        for timestamp, fromId, toId, payload in rows
+    ]
+
+
+def positions(db_file: Path, count: int, offset: int = 0) -> list[Record]:
+    """
+    newest first
+    """
+    db = connect(db_file)
+    rows = db.execute(
+        (
+            "SELECT timestamp, node, latitude, longitude, altitude FROM position "
+            "ORDER BY id DESC LIMIT ? OFFSET ?"
+        ),
+        (count, offset),
+    ).fetchall()
+    db.close()
+    return [
+        Record(
+            node,
+            Position(id=node, latitude=lat, longitude=lon, altitude=alt),
+            to_epoch(timestamp),
+        )
+        for timestamp, node, lat, lon, alt in rows
+    ]
+
+
+def link_stats(db_file: Path) -> list[LinkStats]:
+    db = connect(db_file)
+    rows = db.execute(
+        "SELECT node, last_heard, packets, snr, rssi, hops FROM link_stats"
+    ).fetchall()
+    db.close()
+    return [
+        LinkStats(
+            id=node,
+            last_heard=to_epoch(last_heard) if last_heard else None,
+            packets=packets,
+            snr=snr,
+            rssi=rssi,
+            hops=json.loads(hops),
+        )
+        for node, last_heard, packets, snr, rssi, hops in rows
+    ]
+
+
+def node_latest(db_file: Path, node: str) -> Optional[NodeLatest]:
+    db = connect(db_file)
+    db.row_factory = sqlite3.Row
+    row = db.execute("SELECT * FROM node_latest WHERE node = ?", (node,)).fetchone()
+    db.close()
+    if row:
+        return NodeLatest(**dict(row))
@@ -0,0 +1,156 @@
+"""
+Full-text search over logged messages with SQLite FTS5.
+
+Only channel messages are indexed, direct messages are nobody else's
+business. Triggers keep message_fts current as the writer thread inserts
+messages. Rows logged before the index existed are indexed newest first,
+a chunk at a time, whenever the writer thread is idle.
+"""
+
+from pathlib import Path
+import re
+import sqlite3
+from sqlite3 import Connection
+
+from loguru import logger as log
+
+from .decoders import BROADCAST_ID
+from .queries import LoggedMessage, connect, parse_timestamp
+
+FTS_DDL = f"""
+CREATE VIRTUAL TABLE message_fts USING fts5(
+    payload, content='message', content_rowid='id'
+);
+
+CREATE TRIGGER message_fts_insert AFTER INSERT ON message
+WHEN new.toId = '{BROADCAST_ID}' BEGIN
+    INSERT INTO message_fts(rowid, payload) VALUES (new.id, new.payload);
+END;
+
+CREATE TRIGGER message_fts_delete AFTER DELETE ON message
+WHEN old.toId = '{BROADCAST_ID}' BEGIN
+    INSERT INTO message_fts(message_fts, rowid, payload)
+    VALUES ('delete', old.id, old.payload);
+END;
+"""
+
+# rows below this id still need to be indexed
+BACKFILL_KEY = "fts_backfill_below"
+
+
+def fts5_available() -> bool:
+    db = sqlite3.connect(":memory:")
+    try:
+        db.execute("CREATE VIRTUAL TABLE t USING fts5(x)")
+        return True
+    except sqlite3.OperationalError:
+        return False
+    finally:
+        db.close()
+
+
+def create_search_index(db_file: Path, rebuild: bool = False) -> bool:
+    """
+    create the index if needed, return False if this SQLite can't do FTS5
+    """
+    if not fts5_available():
+        log.warning("SQLite was built without FTS5, 'log search' is disabled")
+        return False
+
+    db = sqlite3.connect(db_file)
+    exists = db.execute(
+        "SELECT sql FROM sqlite_master WHERE name = 'message_fts'"
+    ).fetchone()
+
+    # indexes from before message.id used implicit rowids and held direct messages
+    if exists and (rebuild or "content_rowid='rowid'" in exists[0]):
+        log.info("Rebuilding message search index..")
+        db.executescript(
+            """
+            DROP TRIGGER IF EXISTS message_fts_insert;
+            DROP TRIGGER IF EXISTS message_fts_delete;
+            DROP TABLE message_fts;
+            """
+        )
+        exists = None
+
+    if not exists:
+        # new rows are indexed by trigger from here on, older ones by backfill
+        db.executescript(FTS_DDL)
+        (max_id,) = db.execute("SELECT COALESCE(MAX(id), 0) FROM message").fetchone()
+        db.execute(
+            "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+            (BACKFILL_KEY, max_id + 1),
+        )
+        db.commit()
+    db.close()
+    return True
+
+
+def backfill(db: Connection, chunk: int = 500) -> int:
+    """
+    index the next chunk of old messages, return how many were indexed
+    runs on the writer thread
+    """
+    row = db.execute("SELECT value FROM meta WHERE key = ?", (BACKFILL_KEY,)).fetchone()
+    if row is None:
+        return 0
+
+    rows = db.execute(
+        "SELECT id, payload FROM message WHERE id < ? AND toId = ? "
+        "ORDER BY id DESC LIMIT ?",
+        (row[0], BROADCAST_ID, chunk),
+    ).fetchall()
+
+    with db:
+        if rows:
+            db.executemany("INSERT INTO message_fts(rowid, payload) VALUES (?, ?)", rows)
+            db.execute(
+                "UPDATE meta SET value = ? WHERE key = ?", (rows[-1][0], BACKFILL_KEY)
+            )
+        else:
+            log.info("Message search index backfill is complete")
+            db.execute("DELETE FROM meta WHERE key = ?", (BACKFILL_KEY,))
+    return len(rows)
+
+
+def match_expression(terms: str) -> str:
+    """
+    quote each word so user input can't be FTS5 syntax, keep trailing * for prefixes
+    """
+    expression = []
+    for word in re.findall(r"[\w']+\*?", terms):
+        prefix = word.endswith("*")
+        word = word.rstrip("*").replace('"', "")
+        expression.append(f'"{word}"' + ("*" if prefix else ""))
+    return " ".join(expression)
+
+
+def search(db_file: Path, terms: str, limit: int = 10) -> list[LoggedMessage]:
+    """
+    best matches first
+    """
+    expression = match_expression(terms)
+    if not expression:
+        return []
+
+    db = connect(db_file)
+    rows = db.execute(
+        (
+            "SELECT m.timestamp, m.fromId, m.toId, m.payload "
+            "FROM message_fts JOIN message m ON m.id = message_fts.rowid "
+            "WHERE message_fts MATCH ? AND m.toId = ? ORDER BY rank LIMIT ?"
+        ),
+        (expression, BROADCAST_ID, limit),
+    ).fetchall()
+    db.close()
+
+    return [
+        LoggedMessage(
+            timestamp=parse_timestamp(timestamp),
+            fromId=fromId,
+            toId=toId,
+            payload=payload,
+        )
+        for timestamp, fromId, toId, payload in rows
+    ]
@@ -0,0 +1,294 @@
+"""
+Places the writer thread sends records.
+
+Enable sinks by name in the config file:
+
+    [door.commands.mesh_logger]
+    sinks = sqlite, ndjson
+
+MeshLogger always adds a RingSink of recent records.
+"""
+
+from abc import ABC, abstractmethod
+from collections import deque
+from collections.abc import Callable, Sequence
+import json
+from pathlib import Path
+import sqlite3
+import time
+from threading import Event, Lock
+from queue import Empty
+from typing import Optional
+
+from loguru import logger as log
+
+from ...models import Message, Position, DeviceMetric, EnvironmentMetric
+from .decoders import Record, BROADCAST_ID
+from .db import WRITERS, insert_node
+from .work_queue import WorkQueue
+
+
+class Sink(ABC):
+    """
+    receives every record taken off the work queue
+
+    open, write, flush and close are all called on the writer thread
+    """
+
+    name: str
+
+    def open(self):
+        pass
+
+    @abstractmethod
+    def write(self, record: Record):
+        pass
+
+    def flush(self):
+        """
+        called after each batch of records
+        """
+        pass
+
+    def idle(self):
+        """
+        called when the queue is empty, for background maintenance
+        """
+        pass
+
+    def close(self):
+        pass
+
+
+class SqliteSink(Sink):
+    name = "sqlite"
+
+    def __init__(self, db_file: Path):
+        self.db_file = db_file
+
+        # run with our connection when idle, should do a small amount of work each call
+        self.maintenance: list[Callable[[sqlite3.Connection], None]] = []
+
+    def open(self):
+        # connections belong to the thread that made them
+        self.db = sqlite3.connect(self.db_file)
+        # readers (exports, the REST API) then see a snapshot instead of blocking us
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.cursor = self.db.cursor()
+
+    def write(self, record: Record):
+        insert = WRITERS.get(type(record.item))
+        if insert is None:
+            log.debug(f"No SQLite writer for {type(record.item).__name__}")
+            return
+        insert_node(self.cursor, record.node)
+        insert(self.cursor, record)
+
+    def flush(self):
+        self.db.commit()
+
+    def idle(self):
+        for task in self.maintenance:
+            try:
+                task(self.db)
+            except:
+                log.exception(f"mesh_logger maintenance {task} failed")
+
+    def close(self):
+        self.cursor.close()
+        self.db.close()
+
+
+class NdjsonSink(Sink):
+    """
+    one JSON object per line, rotated to file.1, file.2, .. when it gets big
+    """
+
+    name = "ndjson"
+
+    def __init__(self, path: Path, max_bytes: int, backups: int):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+
+    def open(self):
+        self.fd = self.path.open("a", encoding="utf-8")
+
+    def write(self, record: Record):
+        data = {
+            "type": type(record.item).__name__,
+            "node": record.node,
+            "rx_time": record.rx_time,
+            **record.item.model_dump(mode="json", exclude_none=True),
+        }
+        self.fd.write(json.dumps(data) + "\n")
+
+    def flush(self):
+        self.fd.flush()
+        if self.fd.tell() >= self.max_bytes:
+            self.rotate()
+
+    def rotate(self):
+        self.fd.close()
+        for n in range(self.backups - 1, 0, -1):
+            older = self.path.with_name(f"{self.path.name}.{n}")
+            if older.exists():
+                older.replace(self.path.with_name(f"{self.path.name}.{n + 1}"))
+        if self.backups > 0:
+            self.path.replace(self.path.with_name(f"{self.path.name}.1"))
+        else:
+            self.path.unlink()
+        self.fd = self.path.open("a", encoding="utf-8")
+
+    def close(self):
+        self.fd.close()
+
+
+class RingSink(Sink):
+    """
+    recent records in memory so 'log' and the REST API rarely need SQLite
+
+    channel messages are always kept, positions and telemetry only when
+    their ring size is above zero
+    """
+
+    name = "ring"
+
+    def __init__(self, messages: int, positions: int = 0, telemetry: int = 0):
+        # the writer thread appends while command and API threads read
+        self.lock = Lock()
+        self.rings: dict[str, deque[Record]] = {
+            "message": deque(maxlen=messages),
+            "position": deque(maxlen=positions),
+            "telemetry": deque(maxlen=telemetry),
+        }
+
+    @staticmethod
+    def kind(record: Record) -> Optional[str]:
+        if isinstance(record.item, Message):
+            if record.item.toId == BROADCAST_ID:
+                return "message"
+        elif isinstance(record.item, Position):
+            return "position"
+        elif isinstance(record.item, (DeviceMetric, EnvironmentMetric)):
+            return "telemetry"
+        return None
+
+    def write(self, record: Record):
+        kind = self.kind(record)
+        if kind:
+            with self.lock:
+                self.rings[kind].append(record)
+
+    def prime(self, kind: str, records: list[Record]):
+        """
+        fill a ring with records from storage, oldest first
+        call before the writer thread starts
+        """
+        with self.lock:
+            self.rings[kind].extend(records)
+
+    def recent(self, kind: str, count: int, offset: int = 0) -> list[Record]:
+        """
+        newest first, skipping the newest offset records
+        """
+        with self.lock:
+            ring = self.rings[kind]
+            end = len(ring) - offset
+            return [ring[i] for i in range(end - 1, max(end - count, 0) - 1, -1)]
+
+    def complete(self, kind: str) -> bool:
+        """
+        True when the ring has never overflowed, so storage has nothing older
+        """
+        with self.lock:
+            return len(self.rings[kind]) < self.rings[kind].maxlen
+
+
+def throttled(task: Callable[[sqlite3.Connection], int], seconds: int):
+    """
+    wrap a maintenance task to run at most every seconds while it has nothing to do
+    tasks return how much work they did, and run again right away if that wasn't 0
+    """
+    next_run = 0
+
+    def run(db: sqlite3.Connection):
+        nonlocal next_run
+        if time.monotonic() < next_run:
+            return
+        if not task(db):
+            next_run = time.monotonic() + seconds
+
+    return run
+
+
+# sink name -> factory taking the MeshLogger command, for its settings
+SINKS: dict[str, Callable[..., Sink]] = {
+    "sqlite": lambda ml: SqliteSink(ml.db_file),
+    "ndjson": lambda ml: NdjsonSink(
+        ml.get_setting(Path, "data_dir") / "mesh_logger.ndjson",
+        ml.get_setting(int, "ndjson_max_mb", 16) * 1024 * 1024,
+        ml.get_setting(int, "ndjson_backups", 3),
+    ),
+}
+
+
+def writer(
+    work: WorkQueue,
+    sinks: list[Sink],
+    shutdown: Event,
+    filters: Sequence[Callable[[Record], bool]] = (),
+    batch_size: int = 100,
+):
+    """
+    take records off the queue in batches and hand the ones that pass
+    every filter to every sink
+    """
+    for sink in sinks:
+        sink.open()
+
+    log.debug(f"started mesh_logger thread with sinks {[s.name for s in sinks]}")
+    while not shutdown.is_set():
+        try:
+            batch = [work.get(timeout=1)]
+        except Empty:
+            # bring back anything that overflowed to disk while we were busy
+            if work.unspill() == 0:
+                for sink in sinks:
+                    sink.idle()
+            continue
+
+        while len(batch) < batch_size:
+            try:
+                batch.append(work.get_nowait())
+            except Empty:
+                break
+
+        for record in batch:
+            if not all(keep(record) for keep in filters):
+                continue
+            log.debug(
+                f"{type(record.item).__name__} {record.item.model_dump(exclude_unset=True)}"
+            )
+            for sink in sinks:
+                try:
+                    sink.write(record)
+                except:
+                    log.exception(f"{sink.name} sink failed to write {record}")
+
+        for sink in sinks:
+            try:
+                sink.flush()
+            except:
+                log.exception(f"{sink.name} sink failed to flush")
+
+        # always mark work done so shutdown can't hang on a failed write
+        for _ in batch:
+            work.task_done()
+
+        # a steady trickle of records would keep the writer from ever being idle
+        if work.qsize() <= work.low_water:
+            work.unspill()
+
+    for sink in sinks:
+        sink.close()
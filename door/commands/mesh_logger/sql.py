@@ -0,0 +1,135 @@
+"""
+Ad-hoc read-only SQL for operators, with a budget.
+
+Queries run on a small pool of read-only connections. A progress handler
+stops any query that runs too long or executes too many VM instructions,
+and at most max_rows rows are fetched. With the database in WAL mode a
+reader never blocks the writer thread.
+"""
+
+from contextlib import contextmanager
+from pathlib import Path
+from queue import Queue, Empty
+import sqlite3
+import time
+from typing import Any
+
+from pydantic import BaseModel
+
+# SQLite calls the progress handler every this many VM instructions
+PROGRESS_STEPS = 1000
+
+# statements a query may be made of, everything else (ATTACH, PRAGMA, ..) is denied
+ALLOWED_ACTIONS = {
+    sqlite3.SQLITE_SELECT,
+    sqlite3.SQLITE_READ,
+    sqlite3.SQLITE_FUNCTION,
+    sqlite3.SQLITE_RECURSIVE,
+}
+
+
+class QueryError(Exception):
+    pass
+
+
+class SqlResult(BaseModel):
+    columns: list[str]
+    rows: list[list[Any]]
+    truncated: bool
+    elapsed_ms: int
+
+
+def authorize(action: int, *args) -> int:
+    return sqlite3.SQLITE_OK if action in ALLOWED_ACTIONS else sqlite3.SQLITE_DENY
+
+
+class QueryPool:
+    def __init__(
+        self,
+        db_file: Path,
+        size: int = 2,
+        max_seconds: float = 2.0,
+        max_steps: int = 5_000_000,
+        max_rows: int = 50,
+    ):
+        self.max_seconds = max_seconds
+        self.max_steps = max_steps
+        self.max_rows = max_rows
+
+        self.idle: Queue[sqlite3.Connection] = Queue()
+        for _ in range(size):
+            db = sqlite3.connect(
+                f"file:{db_file}?mode=ro", uri=True, check_same_thread=False
+            )
+            db.execute("PRAGMA query_only = ON")
+            db.set_authorizer(authorize)
+            self.idle.put(db)
+
+    @contextmanager
+    def connection(self):
+        try:
+            db = self.idle.get(timeout=self.max_seconds)
+        except Empty:
+            raise QueryError("Busy, try again.")
+        try:
+            yield db
+        finally:
+            db.set_progress_handler(None, 0)
+            self.idle.put(db)
+
+    def run(self, query: str, max_rows: int = None) -> SqlResult:
+        max_rows = min(max_rows or self.max_rows, self.max_rows)
+        started = time.monotonic()
+        deadline = started + self.max_seconds
+        steps = 0
+
+        def over_budget() -> int:
+            nonlocal steps
+            steps += PROGRESS_STEPS
+            # anything but 0 interrupts the query
+            return steps > self.max_steps or time.monotonic() > deadline
+
+        with self.connection() as db:
+            db.set_progress_handler(over_budget, PROGRESS_STEPS)
+            try:
+                cursor = db.execute(query)
+                rows = cursor.fetchmany(max_rows + 1)
+            except sqlite3.OperationalError as e:
+                if str(e) == "interrupted":
+                    raise QueryError(
+                        f"Stopped after {time.monotonic() - started:.1f}s, "
+                        f"{steps} steps."
+                    )
+                raise QueryError(str(e))
+            except (sqlite3.DatabaseError, sqlite3.Warning) as e:
+                raise QueryError(str(e))
+            finally:
+                db.rollback()
+
+        return SqlResult(
+            columns=[c[0] for c in cursor.description or []],
+            rows=[list(row) for row in rows[:max_rows]],
+            truncated=len(rows) > max_rows,
+            elapsed_ms=int((time.monotonic() - started) * 1000),
+        )
+
+    def close(self):
+        while not self.idle.empty():
+            self.idle.get_nowait().close()
+
+
+def format_result(result: SqlResult, limit: int = 200) -> str:
+    """
+    rows as 'a|b|c' lines, as many as fit in one message
+    """
+    lines = ["|".join(result.columns)]
+    lines += ["|".join("" if v is None else str(v) for v in row) for row in result.rows]
+
+    reply = ""
+    for shown, line in enumerate(lines):
+        if len(reply + line) + 12 > limit:
+            return (reply + f"+{len(lines) - shown} more").strip()
+        reply += line + "\n"
+    if result.truncated:
+        reply += "+more"
+    return reply.strip()
@@ -0,0 +1,162 @@
+"""
+Telemetry history: read a time window into NumPy arrays and bin it.
+
+The same binned series backs 'log batt <node>' style replies and the
+REST API's downsampled series for dashboards.
+"""
+
+import datetime
+from pathlib import Path
+import time
+from typing import Optional
+
+import numpy as np
+from pydantic import BaseModel
+
+from .queries import connect, from_epoch
+
+# name used in commands -> (table, column, unit)
+METRICS = {
+    "batt": ("device_metric", "batteryLevel", "%"),
+    "util": ("device_metric", "channelUtilization", "%"),
+    "air": ("device_metric", "airUtilTx", "%"),
+    "temp": ("environment_metric", "temperature", "C"),
+    "hum": ("environment_metric", "relative_humidity", "%"),
+    "press": ("environment_metric", "barometric_pressure", "hPa"),
+    "lux": ("environment_metric", "lux", "lx"),
+    "wind": ("environment_metric", "wind_speed", "m/s"),
+}
+
+SPARKS = "▁▂▃▄▅▆▇█"
+
+
+class TelemetryPoint(BaseModel):
+    timestamp: datetime.datetime
+    mean: Optional[float] = None
+    min: Optional[float] = None
+    max: Optional[float] = None
+    count: int
+
+
+class TelemetrySeries(BaseModel):
+    node: str
+    metric: str
+    unit: str
+    start: datetime.datetime
+    end: datetime.datetime
+    points: list[TelemetryPoint]
+
+
+def read_series(
+    db_file: Path, node: str, metric: str, start: int, end: int
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    (epoch seconds, values) for node between start and end
+    """
+    table, column, _ = METRICS[metric]
+    db = connect(db_file)
+    rows = db.execute(
+        (
+            f"SELECT CAST(strftime('%s', timestamp) AS INTEGER), {column} FROM {table} "
+            f"WHERE node = ? AND {column} IS NOT NULL "
+            "AND timestamp >= datetime(?, 'unixepoch') AND timestamp < datetime(?, 'unixepoch')"
+        ),
+        (node, start, end),
+    ).fetchall()
+    db.close()
+
+    data = np.array(rows, dtype=np.float64).reshape(-1, 2)
+    return data[:, 0], data[:, 1]
+
+
+def bin_series(
+    times: np.ndarray, values: np.ndarray, start: int, end: int, bins: int
+) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    (count, mean, min, max) per equal-width time bin, NaN where a bin is empty
+    """
+    index = ((times - start) * bins // (end - start)).astype(np.intp)
+    index = np.clip(index, 0, bins - 1)
+
+    count = np.bincount(index, minlength=bins)
+    total = np.bincount(index, weights=values, minlength=bins)
+    empty = count == 0
+
+    mean = np.full(bins, np.nan)
+    np.divide(total, count, out=mean, where=~empty)
+
+    low = np.full(bins, np.inf)
+    np.minimum.at(low, index, values)
+    low[empty] = np.nan
+
+    high = np.full(bins, -np.inf)
+    np.maximum.at(high, index, values)
+    high[empty] = np.nan
+
+    return count, mean, low, high
+
+
+def sparkline(values: np.ndarray) -> str:
+    """
+    one character per value, blank for NaN
+    """
+    if np.all(np.isnan(values)):
+        return " " * len(values)
+
+    low, high = np.nanmin(values), np.nanmax(values)
+    scale = (high - low) or 1.0
+    levels = np.rint((values - low) / scale * (len(SPARKS) - 1))
+    return "".join(
+        " " if np.isnan(level) else SPARKS[int(level)] for level in levels
+    )
+
+
+def series(
+    db_file: Path, node: str, metric: str, hours: float, points: int
+) -> TelemetrySeries:
+    end = int(time.time())
+    start = end - int(hours * 3600)
+    times, values = read_series(db_file, node, metric, start, end)
+    count, mean, low, high = bin_series(times, values, start, end, points)
+
+    width = (end - start) / points
+    nan_to_none = lambda a: [None if np.isnan(x) else round(float(x), 3) for x in a]
+    return TelemetrySeries(
+        node=node,
+        metric=metric,
+        unit=METRICS[metric][2],
+        start=from_epoch(start),
+        end=from_epoch(end),
+        points=[
+            TelemetryPoint(
+                timestamp=from_epoch(int(start + (i + 0.5) * width)),
+                mean=m,
+                min=lo,
+                max=hi,
+                count=int(c),
+            )
+            for i, (c, m, lo, hi) in enumerate(
+                zip(count, nan_to_none(mean), nan_to_none(low), nan_to_none(high))
+            )
+        ],
+    )
+
+
+def summary(db_file: Path, node: str, metric: str, hours: float, bins: int = 24) -> str:
+    """
+    short reply with a sparkline for one packet
+    """
+    end = int(time.time())
+    start = end - int(hours * 3600)
+    times, values = read_series(db_file, node, metric, start, end)
+    if len(values) == 0:
+        return f"No {metric} readings from {node} in {hours:g}h."
+
+    _, mean, _, _ = bin_series(times, values, start, end, bins)
+    unit = METRICS[metric][2]
+    return (
+        f"{node} {metric} {hours:g}h\n"
+        f"{sparkline(mean)}\n"
+        f"min {values.min():.1f} max {values.max():.1f} "
+        f"avg {values.mean():.1f}{unit} now {values[np.argmax(times)]:.1f}{unit}"
+    )
@@ -0,0 +1,159 @@
+"""
+Keep position logging small for nodes that don't move.
+
+PositionDeadband drops a position unless the node moved far enough or
+enough time passed since the last one we stored. simplify_tracks thins
+stored tracks with Douglas-Peucker once they are old enough.
+"""
+
+import math
+import time
+from sqlite3 import Connection
+
+from loguru import logger as log
+import numpy as np
+
+from ...models import Position
+from .decoders import Record
+
+EARTH_RADIUS_M = 6371008.8
+
+# positions with id at or below this have been simplified
+SIMPLIFIED_KEY = "track_simplified_upto"
+
+
+def distance_m(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """
+    great-circle distance in meters
+    """
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    dp = p2 - p1
+    dl = math.radians(lon2 - lon1)
+    a = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(math.sqrt(a))
+
+
+class PositionDeadband:
+    """
+    record filter for the writer thread, True means keep the record
+    """
+
+    def __init__(self, min_meters: float, min_seconds: int):
+        self.min_meters = min_meters
+        self.min_seconds = min_seconds
+
+        # node -> (latitude, longitude, rx_time) of the last position kept
+        self.last: dict[str, tuple[float, float, int]] = {}
+        self.suppressed = 0
+
+    def __call__(self, record: Record) -> bool:
+        if not isinstance(record.item, Position):
+            return True
+
+        position: Position = record.item
+        previous = self.last.get(record.node)
+        if previous:
+            latitude, longitude, rx_time = previous
+            moved = distance_m(latitude, longitude, position.latitude, position.longitude)
+            if moved <= self.min_meters and (
+                self.min_seconds <= 0 or record.rx_time - rx_time < self.min_seconds
+            ):
+                self.suppressed += 1
+                return False
+
+        self.last[record.node] = (position.latitude, position.longitude, record.rx_time)
+        return True
+
+
+def douglas_peucker(points: np.ndarray, epsilon: float) -> list[int]:
+    """
+    indexes of the points to keep, points are an (n, 2) array of (x, y) meters
+    """
+    if len(points) < 3:
+        return list(range(len(points)))
+
+    x, y = points[:, 0], points[:, 1]
+    keep = {0, len(points) - 1}
+    stack = [(0, len(points) - 1)]
+    while stack:
+        first, last = stack.pop()
+        if last - first < 2:
+            continue
+        x1, y1, x2, y2 = x[first], y[first], x[last], y[last]
+        dx, dy = x2 - x1, y2 - y1
+        length = math.hypot(dx, dy)
+
+        # distances of everything in between at once
+        xs, ys = x[first + 1 : last], y[first + 1 : last]
+        if length == 0:
+            d = np.hypot(xs - x1, ys - y1)
+        else:
+            d = np.abs(dy * xs - dx * ys + x2 * y1 - y2 * x1) / length
+        farthest = int(np.argmax(d))
+
+        if d[farthest] > epsilon:
+            index = first + 1 + farthest
+            keep.add(index)
+            stack.append((first, index))
+            stack.append((index, last))
+
+    return sorted(keep)
+
+
+def project(rows: list[tuple]) -> np.ndarray:
+    """
+    (latitude, longitude) to local (x, y) meters, fine for one node's track
+    """
+    degrees = np.radians(np.array(rows, dtype=np.float64))
+    return np.column_stack(
+        (
+            EARTH_RADIUS_M * degrees[:, 1] * math.cos(degrees[0, 0]),
+            EARTH_RADIUS_M * degrees[:, 0],
+        )
+    )
+
+
+def simplify_tracks(
+    db: Connection, epsilon_m: float, min_age_s: int, chunk: int = 1000
+) -> int:
+    """
+    thin positions older than min_age_s, return how many rows were looked at
+    runs on the writer thread, a chunk of rows per call so a call stays short
+    """
+    row = db.execute("SELECT value FROM meta WHERE key = ?", (SIMPLIFIED_KEY,)).fetchone()
+    done = row[0] if row else 0
+    cutoff = time.time() - min_age_s
+
+    rows = db.execute(
+        (
+            "SELECT id, node, latitude, longitude FROM position "
+            "WHERE id > ? AND timestamp < datetime(?, 'unixepoch') "
+            "ORDER BY id LIMIT ?"
+        ),
+        (done, cutoff, chunk),
+    ).fetchall()
+    if not rows:
+        return 0
+
+    tracks: dict[str, list[tuple]] = {}
+    for id, node, latitude, longitude in rows:
+        if latitude is not None and longitude is not None:
+            tracks.setdefault(node, []).append((id, latitude, longitude))
+
+    remove = []
+    for track in tracks.values():
+        keep = douglas_peucker(project([(lat, lon) for _, lat, lon in track]), epsilon_m)
+        kept = set(keep)
+        remove.extend(track[i][0] for i in range(len(track)) if i not in kept)
+
+    with db:
+        db.executemany("DELETE FROM position WHERE id = ?", [(id,) for id in remove])
+        db.execute(
+            "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+            (SIMPLIFIED_KEY, rows[-1][0]),
+        )
+
+    if remove:
+        log.debug(f"Track simplification removed {len(remove)} of {len(rows)} positions")
+    # not len(remove), a chunk with nothing to remove isn't the end of the work
+    return len(rows)
@@ -0,0 +1,180 @@
+"""
+Bounded queue between the radio thread and the writer thread.
+"""
+
+import json
+from collections import Counter
+from pathlib import Path
+from threading import Lock
+from queue import Queue, Full
+from typing import Optional
+
+from loguru import logger as log
+
+from .decoders import Record, MODELS
+
+
+# what to do when the work queue is full
+DROP_OLDEST = "drop_oldest"
+DROP_PRIORITY = "priority"
+SPILL = "spill"
+OVERFLOW_POLICIES = (DROP_OLDEST, DROP_PRIORITY, SPILL)
+
+# with overflow = priority, the lowest number is dropped first
+PRIORITY = {
+    "EnvironmentMetric": 0,
+    "DeviceMetric": 1,
+    "Position": 2,
+    "UserInfo": 3,
+    "Neighbor": 1,
+    "LinkStats": 3,
+    "Message": 4,
+}
+
+
+class WorkQueue(Queue):
+    """
+    offer(..) never blocks. when the queue is full, the overflow policy
+    decides what is lost and every loss is counted by type in self.dropped
+    """
+
+    def __init__(
+        self,
+        maxsize: int,
+        overflow: str = DROP_OLDEST,
+        spill_file: Path = None,
+        spill_max_bytes: int = 0,
+        low_water: int = None,
+    ):
+        super().__init__(maxsize)
+        self.overflow = overflow
+        self.spill_file = spill_file
+        self.spill_max_bytes = spill_max_bytes
+        # below this many queued records, spilled ones are read back right away
+        self.low_water = maxsize // 4 if low_water is None else low_water
+        self.spill_lock = Lock()
+        self.spill_offset = 0
+        # counts by type name
+        self.dropped = Counter()
+        self.spilled = Counter()
+
+    def offer(self, record: Record) -> bool:
+        """
+        add a record without blocking, return False if it was dropped
+        """
+        with self.mutex:
+            if self._qsize() < self.maxsize:
+                self._put(record)
+                self.unfinished_tasks += 1
+                self.not_empty.notify()
+                return True
+
+            if self.overflow != SPILL:
+                victim = self._find_victim(record)
+                if victim is None:
+                    self.dropped[type(record.item).__name__] += 1
+                    return False
+
+                # replace the victim, unfinished_tasks stays the same
+                dropped = self.queue[victim]
+                del self.queue[victim]
+                self.dropped[type(dropped.item).__name__] += 1
+                self._put(record)
+                self.not_empty.notify()
+                return True
+
+        # do file IO outside of the queue mutex
+        return self._spill(record)
+
+    def _find_victim(self, record: Record) -> Optional[int]:
+        """
+        index of the queued record to drop in favor of record, or None to drop record
+        call with self.mutex held
+        """
+        if self.overflow == DROP_OLDEST:
+            return 0
+
+        # drop the oldest record of the lowest priority, unless this one is lower still
+        lowest = min(PRIORITY.get(type(r.item).__name__, 0) for r in self.queue)
+        if PRIORITY.get(type(record.item).__name__, 0) < lowest:
+            return None
+        for index, queued in enumerate(self.queue):
+            if PRIORITY.get(type(queued.item).__name__, 0) == lowest:
+                return index
+
+    def _spill(self, record: Record) -> bool:
+        name = type(record.item).__name__
+        line = (
+            json.dumps(
+                {
+                    "node": record.node,
+                    "type": name,
+                    "rx_time": record.rx_time,
+                    "item": record.item.model_dump(mode="json", exclude_none=True),
+                }
+            )
+            + "\n"
+        )
+        with self.spill_lock:
+            try:
+                size = self.spill_file.stat().st_size if self.spill_file.exists() else 0
+                if size + len(line) > self.spill_max_bytes:
+                    self.dropped[name] += 1
+                    return False
+                with self.spill_file.open("a", encoding="utf-8") as fd:
+                    fd.write(line)
+            except:
+                log.exception("Failed to spill to disk")
+                self.dropped[name] += 1
+                return False
+        self.spilled[name] += 1
+        return True
+
+    def unspill(self, limit: int = 500) -> int:
+        """
+        move spilled items back into the queue while there is room
+        called by the writer thread when it is idle or the queue is low
+        """
+        if self.spill_file is None or not self.spill_file.exists():
+            return 0
+
+        count = 0
+        with self.spill_lock:
+            with self.spill_file.open("rb") as fd:
+                fd.seek(self.spill_offset)
+                while count < limit:
+                    line = fd.readline()
+                    if not line:
+                        break
+                    try:
+                        data = json.loads(line)
+                        model = MODELS[data["type"]]
+                        record = Record(
+                            data["node"], model(**data["item"]), data["rx_time"]
+                        )
+                        self.put_nowait(record)
+                    except Full:
+                        # leave this line for next time
+                        break
+                    except:
+                        log.exception(f"Skipping bad spill line: {line}")
+                    else:
+                        count += 1
+                    self.spill_offset = fd.tell()
+                at_end = self.spill_offset >= self.spill_file.stat().st_size
+
+            # everything on disk has been read back
+            if at_end:
+                self.spill_file.unlink()
+                self.spill_offset = 0
+        return count
+
+    def status(self) -> str:
+        reply = f"queue {self.qsize()}/{self.maxsize} ({self.overflow})"
+        if self.spilled:
+            reply += f"\nspilled to disk {sum(self.spilled.values())}"
+        if self.dropped:
+            reply += "\ndropped " + ", ".join(
+                f"{name} {count}" for name, count in self.dropped.most_common()
+            )
+        return reply
@@ -2,6 +2,10 @@ from loguru import logger as log
 
 from . import BaseCommand
 from ..models import NodeInfo
+# the module, not the class: config.find_commands takes the first
+# BaseCommand subclass it finds in here
+from . import mesh_logger
+from .mesh_logger.queries import NodeLatest, node_latest
 
 
 def format_node_list(nodes: list[NodeInfo], msg: str) -> str:
@@ -29,9 +33,10 @@ def format_node_list(nodes: list[NodeInfo], msg: str) -> str:
     return response.strip()
 
 
-def format_node_detail(n: NodeInfo) -> str:
+def format_node_detail(n: NodeInfo, latest: NodeLatest = None) -> str:
     """
     output for detail of a node
+    latest fills in what the device DB doesn't have
     """
 
     reply = f"ID: {n.user.id} "
@@ -49,6 +54,16 @@ def format_node_detail(n: NodeInfo) -> str:
             reply += f", {n.position.altitude}\n"
         else:
             reply += "\n"
+    elif latest and latest.latitude is not None and latest.longitude is not None:
+        reply += f"Pos.: {latest.latitude:.7}, {latest.longitude:.8}"
+        reply += f" ({latest.position_time.strftime('%m-%d %H:%M')})\n"
+    if latest and latest.temperature is not None:
+        reply += f"Env: {latest.temperature:.1f}C"
+        if latest.relative_humidity is not None:
+            reply += f" {latest.relative_humidity:.0f}%"
+        if latest.barometric_pressure is not None:
+            reply += f" {latest.barometric_pressure:.0f}hPa"
+        reply += "\n"
     if n.deviceMetrics:
         if n.deviceMetrics.batteryLevel and n.deviceMetrics.voltage:
             reply += f"Batt.: {n.deviceMetrics.batteryLevel}% {n.deviceMetrics.voltage:.3}V\n"
@@ -87,6 +102,16 @@ class NodeQuery(BaseCommand):
 
     node_list_count: int = 5
 
+    def detail(self, n: NodeInfo) -> str:
+        latest = None
+        logger = mesh_logger.MeshLogger.instance
+        if logger:
+            try:
+                latest = node_latest(logger.db_file, n.user.id)
+            except:
+                log.exception(f"Failed to read logged state of '{n.user.id}'")
+        return format_node_detail(n, latest)
+
     def invoke(self, msg: str, node: str) -> str:
 
         msg = msg[len(self.command) :].lstrip()
@@ -107,12 +132,12 @@ class NodeQuery(BaseCommand):
         # they want to know about themselves
         elif msg.strip().lower() == "me":
             n: NodeInfo = self.get_node(node)
-            return format_node_detail(n)
+            return self.detail(n)
 
         # they want to know about us
         elif msg.strip().lower() == "you":
             n = NodeInfo(**self.interface.getMyNodeInfo())
-            return format_node_detail(n)
+            return self.detail(n)
 
         # they want to know about a short name
         elif msg.strip().lower()[:1] != "!":
@@ -120,7 +145,7 @@ class NodeQuery(BaseCommand):
             for n in self.interface.nodes.values():
                 n = NodeInfo(**n)
                 if n.user.shortName.strip().lower() == msg.strip().lower():
-                    return format_node_detail(n)
+                    return self.detail(n)
             return "I can't find that node. Use the short name or the hex identifier that begins with '!'."
 
         # they want information about a node ID
@@ -131,6 +156,6 @@ class NodeQuery(BaseCommand):
                 log.exception(f"Failed to find node '{msg}'")
 
             if n:
-                return format_node_detail(n)
+                return self.detail(n)
             else:
                 return "I can't find that node. Use the short name or the hex identifier that begins with '!'."
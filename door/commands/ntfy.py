@@ -59,7 +59,7 @@ class Ntfy(BaseCommand):
         headers = {"Authorization": f"Bearer {self.ntfy_token}"}
 
         try:
-            response = requests.post(self.ntfy_url, data=full_message, headers=headers)
+            response = self.http.post(self.ntfy_url, data=full_message, headers=headers)
             response.raise_for_status()
             return "Message sent to the operator via ntfy."
         except requests.RequestException as e:
@@ -1,12 +1,23 @@
 from . import BaseCommand
+from ..link_stats import tracker, format_link_stats
 
 
 class Ping(BaseCommand):
     command = "ping"
     description = "'ping' replies with signal strength data"
-    help = "This could be useful to test connectivity."
+    help = (
+        "This could be useful to test connectivity.\n"
+        "'ping stats' for your link over time, 'ping stats <node>' for another node."
+    )
+
+    def load(self):
+        self.links = tracker()
 
     def invoke(self, msg: str, node: str, packet) -> str:
+        args = msg[len(self.command) :].strip().split()
+        if args and args[0].lower() == "stats":
+            return self.stats(args[1] if len(args) > 1 else node)
+
         snr = packet.get("rxSnr", None)
         rssi = packet.get("rxRssi", None)
         hopStart = packet.get("hopStart", None)
@@ -22,3 +33,10 @@ class Ping(BaseCommand):
             response += f"RSSI: {rssi}"
 
         return response
+
+    def stats(self, name: str) -> str:
+        node = self.resolve_node(name)
+        stats = self.links.get(node) if node else None
+        if stats is None:
+            return f"No link stats for {name} yet."
+        return format_link_stats(stats)
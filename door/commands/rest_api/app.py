@@ -1,16 +1,33 @@
+import datetime
 from typing import Union
 from functools import partial
 
-from fastapi import FastAPI, APIRouter, Request, Depends, HTTPException
-from fastapi.responses import RedirectResponse
+from fastapi import FastAPI, APIRouter, Request, Depends, HTTPException, Query
+from fastapi.responses import RedirectResponse, StreamingResponse
 from fastapi.security import APIKeyHeader
+from loguru import logger as log
 
 from meshtastic import BROADCAST_ADDR
 from meshtastic.mesh_interface import MeshInterface
 from meshtastic.protobuf.mesh_pb2 import MeshPacket
 from google.protobuf.json_format import MessageToDict
+from pydantic import BaseModel
 
+from ...link_stats import LinkStats, tracker
 from ...models import NodeInfo
+from ..mesh_logger import MeshLogger
+from ..mesh_logger.search import search
+from ..mesh_logger.export import EXPORT_TABLES, FORMATS, stream
+from ..mesh_logger.sql import QueryError, SqlResult
+from ..mesh_logger.telemetry import METRICS, TelemetrySeries, series
+from ..mesh_logger.queries import (
+    LoggedMessage,
+    LoggedPosition,
+    NodeLatest,
+    node_latest,
+    message_from_record,
+    position_from_record,
+)
 
 
 app = FastAPI(
@@ -19,6 +36,9 @@ app = FastAPI(
 
 node = APIRouter(prefix="/nodes", tags=["nodes"])
 messages = APIRouter(prefix="/messages", tags=["messages"])
+mesh_log = APIRouter(prefix="/log", tags=["log"])
+# the whole log in bulk or by SQL, only served with an api_key
+mesh_log_admin = APIRouter(prefix="/log", tags=["log"])
 
 
 # support simple API key
@@ -42,6 +62,13 @@ def get_interface(request: Request) -> MeshInterface:
     raise HTTPException(500, "Mesh interface not found.")
 
 
+def get_mesh_logger() -> MeshLogger:
+    """ Dependency for request handlers that read the mesh log. """
+    if MeshLogger.instance is None:
+        raise HTTPException(503, "mesh_logger is not loaded.")
+    return MeshLogger.instance
+
+
 @app.get("/", include_in_schema=False)
 def to_docs():
     "Redirect / to docs"
@@ -58,6 +85,12 @@ def list_nodes(interface: MeshInterface = Depends(get_interface)) -> list[NodeIn
     return result
 
 
+@node.get("/links")
+def list_link_stats() -> list[LinkStats]:
+    "Running link quality for every node heard since startup."
+    return tracker().snapshot()
+
+
 @node.get("{node_id}")
 def get_node(
     node_id: str, interface: MeshInterface = Depends(get_interface)
@@ -119,18 +152,134 @@ def send_position(
     return MessageToDict(packet)
 
 
+# recent channel messages
+@mesh_log.get("/messages")
+def recent_messages(
+    limit: int = Query(20, ge=1, le=500),
+    offset: int = Query(0, ge=0),
+    mesh_logger: MeshLogger = Depends(get_mesh_logger),
+) -> list[LoggedMessage]:
+    "Channel messages, newest first. Served from memory when possible."
+    return [
+        message_from_record(r) for r in mesh_logger.recent("message", limit, offset)
+    ]
+
+
+# recent positions
+@mesh_log.get("/positions")
+def recent_positions(
+    limit: int = Query(20, ge=1, le=500),
+    offset: int = Query(0, ge=0),
+    mesh_logger: MeshLogger = Depends(get_mesh_logger),
+) -> list[LoggedPosition]:
+    "Positions from all nodes, newest first. Served from memory when possible."
+    return [
+        position_from_record(r) for r in mesh_logger.recent("position", limit, offset)
+    ]
+
+
+# full-text search
+@mesh_log.get("/search")
+def search_messages(
+    q: str,
+    limit: int = Query(20, ge=1, le=200),
+    mesh_logger: MeshLogger = Depends(get_mesh_logger),
+) -> list[LoggedMessage]:
+    "Search logged messages, best matches first."
+    if not mesh_logger.search_enabled:
+        raise HTTPException(501, "Search is not available.")
+    return search(mesh_logger.db_file, q, limit)
+
+
+# telemetry history
+@mesh_log.get("/telemetry/{node_id}/{metric}")
+def telemetry_series(
+    node_id: str,
+    metric: str,
+    hours: float = Query(24, gt=0, le=24 * 366),
+    points: int = Query(48, ge=1, le=2000),
+    mesh_logger: MeshLogger = Depends(get_mesh_logger),
+) -> TelemetrySeries:
+    "Downsampled series of one metric for one node, with mean, min and max per point."
+    if metric not in METRICS:
+        raise HTTPException(404, f"Unknown metric, try one of {list(METRICS)}")
+    return series(mesh_logger.db_file, node_id, metric, hours, points)
+
+
+# latest state
+@mesh_log.get("/nodes/{node_id}/latest")
+def latest_node_state(
+    node_id: str, mesh_logger: MeshLogger = Depends(get_mesh_logger)
+) -> NodeLatest:
+    "Newest logged position, telemetry and names for one node."
+    latest = node_latest(mesh_logger.db_file, node_id)
+    if latest is None:
+        raise HTTPException(404, "Nothing logged for that node.")
+    return latest
+
+
+# bulk export
+@mesh_log_admin.get("/export/{table}")
+def export_table(
+    table: str,
+    format: str = Query("ndjson", pattern="^(ndjson|csv|parquet)$"),
+    start: Union[datetime.datetime, None] = None,
+    end: Union[datetime.datetime, None] = None,
+    node: Union[str, None] = None,
+    mesh_logger: MeshLogger = Depends(get_mesh_logger),
+) -> StreamingResponse:
+    "Stream a whole table, or a time range of it, as gzip NDJSON, CSV or Parquet."
+    if table not in EXPORT_TABLES:
+        raise HTTPException(404, f"Unknown table, try one of {list(EXPORT_TABLES)}")
+    try:
+        data = stream(mesh_logger.db_file, table, format, start, end, node)
+    except ImportError:
+        raise HTTPException(501, "Parquet export needs pyarrow on the server.")
+    media_type, extension = FORMATS[format]
+    return StreamingResponse(
+        data,
+        media_type=media_type,
+        headers={
+            "Content-Disposition": f'attachment; filename="{table}.{extension}"'
+        },
+    )
+
+
+# operator queries
+class SqlQuery(BaseModel):
+    query: str
+    max_rows: Union[int, None] = None
+
+
+@mesh_log_admin.post("/sql")
+def run_sql(
+    body: SqlQuery, mesh_logger: MeshLogger = Depends(get_mesh_logger)
+) -> SqlResult:
+    "Read-only SQL on the mesh log, stopped if it runs too long or returns too many rows."
+    try:
+        return mesh_logger.sql.run(body.query, body.max_rows)
+    except QueryError as e:
+        raise HTTPException(400, str(e))
+
+
 def run(interface: MeshInterface, host: str, port: int, api_key: str = None):
     import uvicorn
 
     app.include_router(node)
 
+    # these can send on the mesh or read the mesh log
+    protected = [messages, mesh_log]
+
     if api_key:
         validator = partial(validate_api_key, api_key)
         new_router = APIRouter(dependencies=[Depends(validator)])
-        new_router.include_router(messages)
+        for router in protected + [mesh_log_admin]:
+            new_router.include_router(router)
         app.include_router(new_router)
     else:
-        app.include_router(messages)
+        for router in protected:
+            app.include_router(router)
+        log.info("No api_key set, /log/sql and /log/export are not served")
 
     app.extra["interface"] = interface
     uvicorn.run(app, host=host, port=port, workers=1)
@@ -0,0 +1,383 @@
+# For each RSS feed, add two lines to the config.ini file
+# to specify the name and URL of the feed as follows:
+#
+# [door.commands.rss]
+# feed.onion.name = The Onion
+# feed.onion.url = https://theonion.com/rss
+#
+# feeds are refreshed in the background every refresh_minutes, or
+# feed.<short name>.interval minutes for one feed
+#
+# 'rss sub <feed>' pushes new headlines as they appear, see subscriptions.py
+
+from concurrent.futures import ThreadPoolExecutor
+import datetime
+from pathlib import Path
+import time
+from threading import Event, Lock, Thread
+from xml.etree.ElementTree import ParseError, XMLPullParser
+
+import requests
+import feedparser
+from loguru import logger as log
+from pydantic import BaseModel, HttpUrl
+
+from .. import BaseCommand
+from ...http import HttpClient
+from .subscriptions import Subscriptions
+from inspect import getmodule
+
+
+class Entry(BaseModel):
+    # guid, link or atom id, whatever identifies it
+    id: str
+    title: str
+
+
+class Feed(BaseModel):
+    name: str
+    short_name: str
+    url: HttpUrl
+    last_updated: datetime.datetime | None = None
+    headlines: list[str] | None = None
+    entries: list[Entry] | None = None
+
+    # seconds between refreshes, None for the default
+    interval: float | None = None
+    # validators for the next conditional request
+    etag: str | None = None
+    modified: str | None = None
+    # time.monotonic() of the next refresh and failures since the last good one
+    next_refresh: float = 0
+    failures: int = 0
+
+
+def local_name(tag: str) -> str:
+    return tag.rsplit("}", 1)[-1]
+
+
+def parse_entries(data: bytes, max_entries: int) -> list[Entry]:
+    """
+    feedparser for what the streaming parser can't read, often HTML entities
+    """
+    entries = []
+    for e in feedparser.parse(data).get("entries", [])[:max_entries]:
+        if e.get("title"):
+            id = e.get("id") or e.get("link") or e.title
+            entries.append(Entry(id=id, title=e.title))
+    return entries
+
+
+def entry_of(element) -> Entry:
+    """
+    an <item> or <entry> element, None without a title
+    """
+    fields = {local_name(child.tag): child for child in element}
+    title = (fields["title"].text or "").strip() if "title" in fields else ""
+    if not title:
+        return None
+    id = title
+    for name in ("guid", "id", "link"):
+        if name in fields:
+            # atom links keep the URL in href
+            id = (fields[name].text or "").strip() or fields[name].get("href") or id
+            break
+    return Entry(id=id, title=title)
+
+
+def read_entries(
+    response: requests.Response, max_entries: int, max_bytes: int
+) -> list[Entry]:
+    """
+    parse RSS items or Atom entries while downloading, stop after max_entries
+    or max_bytes
+    """
+    parser = XMLPullParser(events=("end",))
+    chunks = []
+    size = 0
+    entries = []
+    try:
+        for chunk in response.iter_content(chunk_size=16384):
+            chunks.append(chunk)
+            size += len(chunk)
+            parser.feed(chunk)
+            for _, element in parser.read_events():
+                if local_name(element.tag) not in ("item", "entry"):
+                    continue
+                entry = entry_of(element)
+                # the entry is done, don't keep it around
+                element.clear()
+                if entry:
+                    entries.append(entry)
+            if len(entries) >= max_entries or size >= max_bytes:
+                return entries[:max_entries]
+    except ParseError:
+        # read the rest the lenient way, still capped
+        for chunk in response.iter_content(chunk_size=16384):
+            if size >= max_bytes:
+                break
+            chunks.append(chunk)
+            size += len(chunk)
+        return parse_entries(b"".join(chunks), max_entries)
+
+    return entries or parse_entries(b"".join(chunks), max_entries)
+
+
+def refresh_feed(
+    feed: Feed,
+    http: HttpClient = requests,
+    max_entries: int = 10,
+    max_bytes: int = 512 * 1024,
+) -> bool:
+    """
+    conditional GET, headlines and validators are only replaced by a good response
+    """
+    headers = {}
+    if feed.etag:
+        headers["If-None-Match"] = feed.etag
+    if feed.modified:
+        headers["If-Modified-Since"] = feed.modified
+
+    with http.get(feed.url, headers=headers, stream=True) as response:
+        if response.status_code == 304 and feed.headlines is not None:
+            feed.last_updated = datetime.datetime.now(datetime.timezone.utc)
+            return True
+        if response.status_code != 200:
+            log.warning(
+                f"Bad response {response.status_code} from feed '{feed.short_name}'"
+            )
+            return False
+        entries = read_entries(response, max_entries, max_bytes)
+
+    if not entries:
+        log.warning(f"No entries in feed response for '{feed.short_name}'")
+        return False
+
+    feed.entries = entries
+    feed.headlines = [e.title for e in entries]
+    feed.etag = response.headers.get("ETag")
+    feed.modified = response.headers.get("Last-Modified")
+    feed.last_updated = datetime.datetime.now(datetime.timezone.utc)
+    return True
+
+
+class RSS(BaseCommand):
+    command = "rss"
+    description = "returns headlines from RSS feeds"
+    help = """Show feeds with 'rss list'.
+'rss sub <feed>' to get new headlines, 'rss unsub <feed>', 'rss subs'"""
+
+    def load(self):
+        self.feeds = self.get_feeds()
+        self.feed_names = [f.short_name for f in self.feeds]
+
+        self.refresh_interval = self.get_setting(float, "refresh_minutes", 30) * 60
+        # only the top of a feed is read
+        self.max_entries = self.get_setting(int, "max_entries", 10)
+        self.max_bytes = self.get_setting(int, "max_feed_kb", 512) * 1024
+        # failing feeds are tried less often, up to this
+        self.max_backoff = self.get_setting(float, "max_backoff_minutes", 360) * 60
+        self.workers = ThreadPoolExecutor(
+            max_workers=self.get_setting(int, "refresh_workers", 4),
+            thread_name_prefix="rss",
+        )
+        self.lock = Lock()
+        self.refreshing: Thread = None
+
+        # subscriptions, sent one at a time so the mesh isn't flooded
+        self.subscriptions = Subscriptions(
+            self.get_setting(Path, "data_dir") / "rss.sqlite"
+        )
+        self.send_interval = self.get_setting(float, "send_interval_seconds", 10)
+        self.node_gap = self.get_setting(float, "sub_node_gap_seconds", 60)
+        self.daily_cap = self.get_setting(int, "sub_daily_cap", 20)
+        self.seen_days = self.get_setting(float, "seen_keep_days", 30)
+        self.stopping = Event()
+        self.delivering = Thread(target=self.deliver, name="rss deliver", daemon=True)
+        self.delivering.start()
+
+    def periodic(self):
+        if not (self.refreshing and self.refreshing.is_alive()):
+            self.refreshing = Thread(target=self.refresh_due, name="rss refresh")
+            self.refreshing.start()
+
+    def shutdown(self):
+        self.stopping.set()
+        self.workers.shutdown(wait=False, cancel_futures=True)
+        self.delivering.join(timeout=5)
+        self.subscriptions.close()
+
+    def refresh_due(self):
+        """
+        refresh every feed whose time has come, all at once
+        """
+        now = time.monotonic()
+        due = [feed for feed in self.feeds if feed.next_refresh <= now]
+        if due:
+            list(self.workers.map(self.refresh, due))
+        self.subscriptions.prune(self.seen_days)
+
+    def refresh(self, feed: Feed) -> bool:
+        interval = feed.interval or self.refresh_interval
+        try:
+            ok = refresh_feed(feed, self.http, self.max_entries, self.max_bytes)
+        except:
+            log.warning(f"Failed to refresh feed '{feed.short_name}'")
+            ok = False
+
+        with self.lock:
+            if ok:
+                feed.failures = 0
+            else:
+                # keep serving the last good headlines, back off
+                feed.failures += 1
+                interval = min(interval * 2**feed.failures, self.max_backoff)
+            feed.next_refresh = time.monotonic() + interval
+
+        if ok and feed.entries:
+            try:
+                self.fan_out(feed)
+            except:
+                log.exception(f"Failed to queue headlines from '{feed.short_name}'")
+        return ok
+
+    def fan_out(self, feed: Feed):
+        """
+        queue entries not seen before for every subscriber of feed
+        """
+        new = self.subscriptions.new_entries(
+            feed.short_name, [e.id for e in feed.entries]
+        )
+        if not new:
+            return
+        entries = [
+            (e.id, f"📰 {feed.name}: {e.title}"[:200])
+            for e in feed.entries
+            if e.id in new
+        ]
+        # oldest first, feeds list the newest at the top
+        count = self.subscriptions.queue(feed.short_name, entries[::-1])
+        log.debug(f"{len(new)} new in '{feed.short_name}', {count} deliveries queued")
+
+    def deliver(self):
+        """
+        send queued headlines, one per send_interval, paced and capped per node
+        """
+        while not self.stopping.wait(self.send_interval):
+            try:
+                delivery = self.subscriptions.next_delivery(
+                    self.node_gap, self.daily_cap
+                )
+                if delivery:
+                    self.send_dm(delivery.message, delivery.node)
+                    self.subscriptions.mark_sent(delivery)
+            except:
+                log.exception("Failed to deliver a headline")
+
+    # Read feeds from settings
+    def get_feeds(self):
+        feeds = []
+        previous = None
+        name = None
+        url = None
+        intervals = {}
+        for key, value in self.settings.items(getmodule(self).__name__, raw=True):
+            item = key.split(".")
+            if item[0] == "feed" and len(item) == 3:
+                short_name = item[1]
+                attr = item[2]
+                if previous != short_name:
+                    previous = short_name
+                    name = None
+                    url = None
+                if attr == "name":
+                    name = value
+                if attr == "url":
+                    url = value
+                if attr == "interval":
+                    intervals[short_name] = float(value) * 60
+                if name and url:
+                    feeds.append(Feed(name=name, short_name=short_name, url=url))
+                    name = None
+        for feed in feeds:
+            feed.interval = intervals.get(feed.short_name)
+        return feeds
+
+    def invoke(self, msg: str, node: str) -> str:
+        # strip invocation command
+        msg = msg[len(self.command) :].lower().lstrip().rstrip()
+
+        # return a list
+        if msg[:4] == "list":
+            return self.list_feeds()
+
+        words = msg.split()
+        if words and words[0] in ("sub", "unsub", "subs"):
+            return self.manage(words, node)
+
+        # search for the requested feed
+        feed: Feed
+        found_feed: Feed = None
+        for feed in self.feeds:
+            if feed.short_name in msg:
+                found_feed = feed
+                break
+
+        if not found_feed:
+            return f"Feed not found. {self.list_feeds()}"
+
+        # served from the background refresh
+        if found_feed.headlines:
+            return self.build_reply(found_feed.headlines)
+
+        # not fetched yet
+        self.run_in_thread(self.fetch, found_feed.short_name, node)
+
+    def fetch(self, short_name: str, node: str):
+        feed = next(f for f in self.feeds if f.short_name == short_name)
+        # a failing feed is left alone until its next try
+        due = feed.next_refresh <= time.monotonic()
+        if feed.headlines or (due and self.refresh(feed)):
+            reply = self.build_reply(feed.headlines)
+        else:
+            reply = f"Couldn't get the {feed.name} feed, try again later."
+        self.send_dm(reply, node)
+
+    def manage(self, words: list[str], node: str) -> str:
+        if words[0] == "subs":
+            feeds = self.subscriptions.feeds_of(node)
+            if not feeds:
+                return "No subscriptions. 'rss sub <feed>' to add one."
+            return "Subscribed to: " + ", ".join(feeds)
+
+        feed = next((f for f in self.feeds if words[1:] == [f.short_name]), None)
+        if not feed:
+            return f"Feed not found. {self.list_feeds()}"
+
+        if words[0] == "sub":
+            if not self.subscriptions.subscribe(node, feed.short_name):
+                return f"Already subscribed to {feed.name}."
+            return (
+                f"Subscribed to {feed.name}, up to {self.daily_cap} headlines a day. "
+                f"'rss unsub {feed.short_name}' to stop."
+            )
+
+        if not self.subscriptions.unsubscribe(node, feed.short_name):
+            return f"Not subscribed to {feed.name}."
+        return f"Unsubscribed from {feed.name}."
+
+    def list_feeds(self) -> str:
+        feed: Feed
+        return "Installed RSS feeds:\n\n" + "\n".join(
+            [f"{feed.short_name}: {feed.name}" for feed in self.feeds]
+        )
+
+    def build_reply(self, titles: list[str]) -> str:
+        reply = ""
+        for t in titles:
+            proposed = f"{t}\n\n"
+            if len(reply + proposed) > 200:
+                break
+            else:
+                reply += proposed
+        return reply.strip()
@@ -0,0 +1,205 @@
+"""
+Headline subscriptions kept in data_dir/rss.sqlite.
+
+Each refresh of a feed is compared once against the entry ids seen
+before, and only new entries are queued, one delivery row per
+subscriber. The delivery thread drains the queue with pacing per node
+and a daily cap. The first time a feed is seen its entries are only
+marked, so nobody gets the whole backlog at once.
+"""
+
+from pathlib import Path
+import sqlite3
+import time
+from threading import Lock
+
+from pydantic import BaseModel
+
+DDL = """
+CREATE TABLE IF NOT EXISTS subscription (
+    node TEXT,
+    feed TEXT,
+    created REAL,
+    PRIMARY KEY (node, feed)
+);
+CREATE TABLE IF NOT EXISTS seen (
+    feed TEXT,
+    entry_id TEXT,
+    last_seen REAL,
+    PRIMARY KEY (feed, entry_id)
+);
+CREATE TABLE IF NOT EXISTS delivery (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    node TEXT,
+    feed TEXT,
+    entry_id TEXT,
+    message TEXT,
+    queued REAL,
+    sent REAL,
+    UNIQUE (node, feed, entry_id)
+);
+CREATE INDEX IF NOT EXISTS delivery_node_sent ON delivery (node, sent);
+"""
+
+DAY = 86400
+
+
+class Delivery(BaseModel):
+    id: int
+    node: str
+    feed: str
+    message: str
+
+
+class Subscriptions:
+    def __init__(self, db_file: Path):
+        self.lock = Lock()
+        self.db = sqlite3.connect(db_file, check_same_thread=False)
+        self.db.executescript(DDL)
+        self.db.commit()
+
+    def subscribe(self, node: str, feed: str) -> bool:
+        """
+        False if already subscribed
+        """
+        with self.lock:
+            cursor = self.db.execute(
+                "INSERT OR IGNORE INTO subscription (node, feed, created) "
+                "VALUES (?, ?, ?)",
+                (node, feed, time.time()),
+            )
+            self.db.commit()
+            return cursor.rowcount > 0
+
+    def unsubscribe(self, node: str, feed: str) -> bool:
+        with self.lock:
+            cursor = self.db.execute(
+                "DELETE FROM subscription WHERE node = ? AND feed = ?", (node, feed)
+            )
+            # and whatever was still waiting for them
+            self.db.execute(
+                "DELETE FROM delivery WHERE node = ? AND feed = ? AND sent IS NULL",
+                (node, feed),
+            )
+            self.db.commit()
+            return cursor.rowcount > 0
+
+    def feeds_of(self, node: str) -> list[str]:
+        with self.lock:
+            rows = self.db.execute(
+                "SELECT feed FROM subscription WHERE node = ? ORDER BY feed", (node,)
+            ).fetchall()
+        return [feed for feed, in rows]
+
+    def new_entries(self, feed: str, entry_ids: list[str]) -> set[str]:
+        """
+        ids not seen before, all of them are marked seen now
+        """
+        if not entry_ids:
+            return set()
+        now = time.time()
+        with self.lock:
+            first_time = (
+                self.db.execute(
+                    "SELECT 1 FROM seen WHERE feed = ? LIMIT 1", (feed,)
+                ).fetchone()
+                is None
+            )
+            known = {
+                entry_id
+                for entry_id, in self.db.execute(
+                    "SELECT entry_id FROM seen WHERE feed = ? AND entry_id IN "
+                    f"({','.join('?' * len(entry_ids))})",
+                    (feed, *entry_ids),
+                )
+            }
+            # entries still in the feed stay seen, see prune()
+            self.db.executemany(
+                "INSERT INTO seen (feed, entry_id, last_seen) VALUES (?, ?, ?) "
+                "ON CONFLICT (feed, entry_id) "
+                "DO UPDATE SET last_seen = excluded.last_seen",
+                [(feed, entry_id, now) for entry_id in entry_ids],
+            )
+            self.db.commit()
+        if first_time:
+            return set()
+        return set(entry_ids) - known
+
+    def queue(self, feed: str, entries: list[tuple[str, str]]) -> int:
+        """
+        (entry id, message) for every subscriber of feed, return rows queued
+        """
+        now = time.time()
+        with self.lock:
+            cursor = self.db.execute(
+                "SELECT node FROM subscription WHERE feed = ?", (feed,)
+            )
+            rows = [
+                (node, feed, entry_id, message, now)
+                for node, in cursor.fetchall()
+                for entry_id, message in entries
+            ]
+            self.db.executemany(
+                "INSERT OR IGNORE INTO delivery "
+                "(node, feed, entry_id, message, queued) "
+                "VALUES (?, ?, ?, ?, ?)",
+                rows,
+            )
+            self.db.commit()
+        return len(rows)
+
+    def next_delivery(
+        self, node_gap: float, daily_cap: int, now: float = None
+    ) -> Delivery:
+        """
+        oldest waiting message for a node that may get one now, None if none may
+        """
+        now = now or time.time()
+        with self.lock:
+            row = self.db.execute(
+                """
+                SELECT d.id, d.node, d.feed, d.message
+                FROM delivery d
+                WHERE d.sent IS NULL
+                AND NOT EXISTS (
+                    SELECT 1 FROM delivery s
+                    WHERE s.node = d.node AND s.sent > ?
+                )
+                AND (
+                    SELECT count(*) FROM delivery s
+                    WHERE s.node = d.node AND s.sent > ?
+                ) < ?
+                ORDER BY d.id
+                LIMIT 1
+                """,
+                (now - node_gap, now - DAY, daily_cap),
+            ).fetchone()
+        if row:
+            return Delivery(id=row[0], node=row[1], feed=row[2], message=row[3])
+        return None
+
+    def mark_sent(self, delivery: Delivery):
+        with self.lock:
+            self.db.execute(
+                "UPDATE delivery SET sent = ? WHERE id = ?", (time.time(), delivery.id)
+            )
+            self.db.commit()
+
+    def prune(self, seen_days: float):
+        """
+        forget entries gone from their feed, old deliveries and stale headlines
+        """
+        now = time.time()
+        with self.lock:
+            self.db.execute(
+                "DELETE FROM seen WHERE last_seen < ?", (now - seen_days * DAY,)
+            )
+            # sent rows are needed for the daily cap, waiting ones are old news
+            self.db.execute(
+                "DELETE FROM delivery WHERE coalesce(sent, queued) < ?", (now - DAY,)
+            )
+            self.db.commit()
+
+    def close(self):
+        with self.lock:
+            self.db.close()
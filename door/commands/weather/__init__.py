@@ -0,0 +1,312 @@
+"""
+commands:
+wx (blank) or forecast
+wx hourly
+wx 3day (1 to 7)
+wx alerts
+wx obs
+
+with alert_watch on, new alerts are sent to the nodes in their zone
+(or to a channel) without being asked
+"""
+
+from pathlib import Path
+import re
+import time
+from threading import Thread
+
+from loguru import logger as log
+
+import pytz
+
+from .. import BaseCommand, CommandLoadError, CommandRunError
+from ...geo import grid_cell, timezone_at
+from .alerts import AlertWatcher, format_alert
+from . import grid
+from .cache import MetaCache
+from .http_cache import HttpCache
+from .nws import (
+    NWS_API,
+    PointInfo,
+    StationInfo,
+    ForecastItem,
+    Alert,
+    ActiveAlert,
+    zone_id,
+    get_active_alerts,
+    get_point_info,
+    get_station_info,
+    get_forecast,
+    get_grid_data,
+    get_observations,
+    get_alerts,
+)
+
+
+class Weather(BaseCommand):
+    command = "wx"
+    description = "read api.weather.gov"
+    help = """'wx' - forecast
+'wx hourly' - next 24 hours
+'wx 3day' - daily summary
+'wx obs' - current observations
+'wx alerts' - alerts"""
+
+    # where to get weather information about the point provided
+    point_info: PointInfo
+
+    default_latitude: float
+    default_longitude: float
+
+    def load(self):
+        self.default_latitude = self.settings.getfloat(
+            "global", "default_latitude", fallback=33.548786
+        )
+        self.default_longitude = self.settings.getfloat(
+            "global", "default_longitude", fallback=-101.905093
+        )
+
+        # points and stations barely change, keep them for a long time
+        self.meta = MetaCache(
+            self.get_setting(Path, "data_dir") / "weather.sqlite",
+            ttl=self.get_setting(float, "metadata_ttl_days", 30) * 86400,
+            refresh_after=self.get_setting(float, "metadata_refresh_days", 7) * 86400,
+        )
+        self.refreshing: Thread = None
+
+        # forecasts, observations and alerts, kept as long as NWS says they are good
+        self.http_cache = HttpCache(
+            get=self.http.get,
+            stale_while_revalidate=self.get_setting(float, "stale_while_revalidate", 600),
+            stale_if_error=self.get_setting(float, "stale_if_error", 86400),
+        )
+
+        # push new alerts, off unless enabled
+        self.watcher: AlertWatcher = None
+        self.watching: Thread = None
+        if self.get_setting(bool, "alert_watch", False):
+            # a channel index sends each alert once there instead of to each node
+            self.alert_channel = self.get_setting(int, "alert_channel", None)
+            self.alert_interval = self.get_setting(float, "alert_watch_minutes", 5) * 60
+            self.next_alert_check = 0
+            self.watcher = AlertWatcher(
+                self.get_setting(Path, "data_dir") / "weather.sqlite",
+                zone_of=self.zone_of,
+                fetch=lambda zone: get_active_alerts(zone, self.http_cache),
+                send=self.send_alert,
+                per_zone=self.alert_channel is None,
+            )
+
+        # try the API
+        try:
+            self.http.get(NWS_API, timeout=5).raise_for_status()
+        except:
+            raise CommandLoadError("Failed to reach NWS API")
+
+    def periodic(self):
+        # keep metadata fresh away from user requests
+        if not (self.refreshing and self.refreshing.is_alive()):
+            self.refreshing = Thread(target=self.meta.refresh, name="wx refresh")
+            self.refreshing.start()
+
+        if (
+            self.watcher
+            and time.monotonic() >= self.next_alert_check
+            and not (self.watching and self.watching.is_alive())
+        ):
+            self.next_alert_check = time.monotonic() + self.alert_interval
+            self.watching = Thread(target=self.watch_alerts, name="wx alerts")
+            self.watching.start()
+
+    def watch_alerts(self):
+        me = self.interface.getMyUser()["id"]
+        positions = {}
+        for node_id, info in list(self.interface.nodes.items()):
+            position = info.get("position", {})
+            if node_id != me and position.get("latitude") and position.get("longitude"):
+                positions[node_id] = (position["latitude"], position["longitude"])
+
+        # a channel hears about our own area too
+        if self.alert_channel is not None:
+            positions[me] = (self.default_latitude, self.default_longitude)
+
+        try:
+            self.watcher.check(positions)
+        except:
+            log.exception("Weather alert check failed")
+
+    def zone_of(self, latitude: float, longitude: float) -> str:
+        return zone_id(self.point_info(latitude, longitude).forecastZone)
+
+    def send_alert(self, alert: ActiveAlert, nodes: list[str]):
+        message = format_alert(alert)
+        if self.alert_channel is not None:
+            self.interface.sendText(message, channelIndex=self.alert_channel)
+        else:
+            for node in nodes:
+                self.send_dm(message, node)
+
+    def invoke(self, msg: str, node: str) -> str:
+        self.run_in_thread(self.run, msg, node)
+
+    def point_info(self, latitude: float, longitude: float) -> PointInfo:
+        latitude, longitude = grid_cell(latitude, longitude)
+        return self.meta.get(
+            f"point:{latitude},{longitude}",
+            PointInfo,
+            lambda: get_point_info(latitude, longitude, self.http),
+        )
+
+    def station_info(self, point_info: PointInfo) -> StationInfo:
+        # every point in a forecast grid square shares its stations
+        url = str(point_info.observationStations)
+        return self.meta.get(f"station:{url}", StationInfo, lambda: get_station_info(url, self.http))
+
+    def run(self, msg: str, node: str):
+        # if we have location for a user, use it
+        latitude = self.default_latitude
+        longitude = self.default_longitude
+        user = self.get_node(node)
+
+        if (
+            user
+            and user.position
+            and user.position.latitude
+            and user.position.longitude
+        ):
+            latitude = user.position.latitude
+            longitude = user.position.longitude
+            log.debug(f"user position: {round(latitude, 5)}, {round(longitude, 5)}")
+
+        # nearby users share cached alerts
+        latitude, longitude = grid_cell(latitude, longitude)
+
+        reply = ""
+        days = re.search(r"(\d)\s*day", msg.lower())
+        if "alerts" in msg.lower():
+            reply = self.alerts(latitude, longitude)
+        elif "hourly" in msg.lower():
+            reply = self.packed(latitude, longitude, None)
+        elif days:
+            reply = self.packed(latitude, longitude, min(max(int(days.group(1)), 1), 7))
+        elif "obs" in msg.lower():
+            reply = self.observations(latitude, longitude)
+        else:
+            reply = self.forecast(latitude, longitude)
+
+        self.send_dm(reply, node)
+
+    def alerts(self, latitude: float, longitude: float) -> str:
+        try:
+            alerts: list[Alert] = get_alerts(latitude, longitude, self.http_cache)
+        except:
+            log.exception("Failed to get alerts")
+            raise CommandRunError()
+
+        if len(alerts) == 0:
+            return "No weather alerts"
+
+        reply = ""
+        for alert in alerts:
+            proposed_addition = (
+                f"({alert.severity}) {alert.headline}: {alert.description}\n"
+            )
+            if len(reply + proposed_addition) > 210:
+                break
+            else:
+                reply += proposed_addition
+        return reply.strip()
+
+    def observations(self, latitude, longitude) -> str:
+        try:
+            point_info = self.point_info(latitude, longitude)
+        except:
+            log.exception("Failed to get point info.")
+            return "Error getting point info."
+
+        try:
+            station_info = self.station_info(point_info)
+        except:
+            log.exception("Failed to get observation stations.")
+            return "Error getting observation stations."
+
+        try:
+            observations = get_observations(
+                station_info.stationIdentifier, self.http_cache
+            )
+        except:
+            log.exception("Failed to get observations")
+            return "Error getting observations."
+
+        if len(observations) == 0:
+            return "No weather observations"
+
+        timezone = pytz.timezone(station_info.timeZone)
+
+        reply = ""
+        for obs in observations:
+            local_time = obs.timestamp.astimezone(timezone).strftime("%H:%M:%S")
+            proposed_addition = (
+                f"{local_time} {obs.temperature:.1f}° C, {obs.humidity:.1f}% RH\n"
+            )
+
+            if len(reply + proposed_addition) > 210:
+                break
+            else:
+                reply += proposed_addition
+        return reply.strip()
+
+    def packed(self, latitude: float, longitude: float, days: int = None) -> str:
+        """
+        dense summaries from gridpoint data, daily or (days None) hourly
+        """
+        try:
+            point_info = self.point_info(latitude, longitude)
+            grid_data = get_grid_data(point_info.forecastGridData, self.http_cache)
+        except:
+            log.exception("Failed to get gridpoint data.")
+            return "Error getting forecast data."
+
+        timezone = point_info.timeZone or timezone_at(latitude, longitude)
+        if days:
+            lines = grid.daily(grid_data, timezone, days)
+        else:
+            lines = grid.hourly_lines(grid_data, timezone)
+        if not lines:
+            return "No forecast data."
+
+        reply = ""
+        for line in lines:
+            if len(reply + line) > 200:
+                break
+            reply += line + "\n"
+        return reply.strip()
+
+    def forecast(self, latitude, longitude):
+        try:
+            point_info = self.point_info(latitude, longitude)
+        except:
+            log.exception("Failed to get point info.")
+            return "Error getting point info."
+
+        try:
+            forecast_periods: list[ForecastItem] = get_forecast(
+                point_info.forecast, self.http_cache
+            )
+        except:
+            raise CommandRunError(f"Failed to request weather forecast.")
+
+        if len(forecast_periods) == 0:
+            return "No forecast returned."
+
+        reply = ""
+        for p in forecast_periods:
+            proposed_addition = f"{p.name.upper()}: {p.detailedForecast}\n"
+            if len(reply + proposed_addition) > 200:
+                break
+            else:
+                reply += proposed_addition
+
+        if reply.strip() == "":
+            return "Forecast was too long 😤"
+        return reply.strip()
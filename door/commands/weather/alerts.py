@@ -0,0 +1,134 @@
+"""
+Watch for new NWS alerts where our nodes are and send them once.
+
+Nodes are grouped by forecast zone, so each check makes one alerts
+request per zone no matter how many nodes are in it. Alerts already sent
+are kept in data_dir/weather.sqlite until they expire, so a restart
+doesn't send them again.
+"""
+
+from collections.abc import Callable
+from pathlib import Path
+import sqlite3
+import time
+from threading import Lock
+
+from loguru import logger as log
+
+from .nws import ActiveAlert
+
+DDL = """
+CREATE TABLE IF NOT EXISTS sent_alert (
+    alert_id TEXT,
+    zone TEXT,
+    expires REAL,
+    PRIMARY KEY (alert_id, zone)
+);
+"""
+
+# when an alert doesn't say when it expires
+DEFAULT_KEEP_SECONDS = 7 * 86400
+
+
+def format_alert(alert: ActiveAlert) -> str:
+    return f"⚠️ {alert.severity} {alert.event}: {alert.headline or ''}".strip()[:200]
+
+
+class AlertWatcher:
+    def __init__(
+        self,
+        db_file: Path,
+        zone_of: Callable[[float, float], str],
+        fetch: Callable[[str], list[ActiveAlert]],
+        send: Callable[[ActiveAlert, list[str]], None],
+        per_zone: bool = True,
+    ):
+        """
+        zone_of(latitude, longitude) -> forecast zone id
+        fetch(zone) -> alerts active in zone
+        send(alert, nodes) -> push one alert to the nodes in its zone
+        with per_zone False each alert is sent once, not once per zone
+        """
+        self.zone_of = zone_of
+        self.fetch = fetch
+        self.send = send
+        self.per_zone = per_zone
+
+        self.lock = Lock()
+        self.db = sqlite3.connect(db_file, check_same_thread=False)
+        self.db.executescript(DDL)
+        self.db.commit()
+
+    def group(
+        self, positions: dict[str, tuple[float, float]]
+    ) -> dict[str, list[str]]:
+        """
+        {node: (latitude, longitude)} -> {zone: [node, ..]}
+        """
+        zones: dict[str, list[str]] = {}
+        for node, (latitude, longitude) in positions.items():
+            try:
+                zone = self.zone_of(latitude, longitude)
+            except:
+                log.debug(f"No forecast zone for {node}")
+                continue
+            zones.setdefault(zone, []).append(node)
+        return zones
+
+    def sent(self, alert: ActiveAlert, zone: str) -> bool:
+        with self.lock:
+            return (
+                self.db.execute(
+                    "SELECT 1 FROM sent_alert WHERE alert_id = ? AND zone = ?",
+                    (alert.id, zone if self.per_zone else ""),
+                ).fetchone()
+                is not None
+            )
+
+    def mark_sent(self, alert: ActiveAlert, zone: str):
+        expires = (
+            alert.expires.timestamp()
+            if alert.expires
+            else time.time() + DEFAULT_KEEP_SECONDS
+        )
+        with self.lock:
+            self.db.execute(
+                "INSERT OR IGNORE INTO sent_alert (alert_id, zone, expires) "
+                "VALUES (?, ?, ?)",
+                (alert.id, zone if self.per_zone else "", expires),
+            )
+            self.db.commit()
+
+    def prune(self):
+        with self.lock:
+            self.db.execute("DELETE FROM sent_alert WHERE expires < ?", (time.time(),))
+            self.db.commit()
+
+    def check(self, positions: dict[str, tuple[float, float]]) -> int:
+        """
+        send new alerts for the zones of these positions, return how many were sent
+        """
+        zones = self.group(positions)
+        count = 0
+        for zone, nodes in zones.items():
+            try:
+                alerts = self.fetch(zone)
+            except:
+                log.warning(f"Failed to get alerts for zone {zone}")
+                continue
+
+            for alert in alerts:
+                if self.sent(alert, zone):
+                    continue
+                try:
+                    self.send(alert, nodes)
+                except:
+                    log.exception(f"Failed to send alert {alert.id}")
+                    continue
+                self.mark_sent(alert, zone)
+                count += 1
+
+        self.prune()
+        if count:
+            log.info(f"Sent {count} weather alerts for {len(zones)} zones")
+        return count
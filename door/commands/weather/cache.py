@@ -0,0 +1,124 @@
+"""
+Persistent cache for NWS metadata that almost never changes.
+
+Point and station lookups are stored in data_dir/weather.sqlite by key
+(a grid cell or a stations URL). Entries older than refresh_after are
+still served and refreshed in the background, entries older than ttl
+are fetched again before they are used.
+"""
+
+from collections.abc import Callable
+from pathlib import Path
+import sqlite3
+import time
+from threading import Lock
+from typing import Optional, TypeVar
+
+from loguru import logger as log
+from pydantic import BaseModel
+
+from ...singleflight import SingleFlight
+
+Model = TypeVar("Model", bound=BaseModel)
+
+DDL = """
+CREATE TABLE IF NOT EXISTS metadata (
+    key TEXT PRIMARY KEY,
+    data TEXT,
+    fetched_at REAL
+);
+"""
+
+
+class MetaCache:
+    def __init__(self, db_file: Path, ttl: float, refresh_after: float):
+        self.ttl = ttl
+        self.refresh_after = refresh_after
+
+        self.lock = Lock()
+        self.db = sqlite3.connect(db_file, check_same_thread=False)
+        self.db.executescript(DDL)
+        self.db.commit()
+
+        # key -> (model, fetched_at), read through from SQLite
+        self.memory: dict[str, tuple[BaseModel, float]] = {}
+
+        # key -> how to fetch it again, for keys used since we started
+        self.fetchers: dict[str, tuple[type[BaseModel], Callable[[], BaseModel]]] = {}
+
+        # users in one cell asking at once make one lookup
+        self.flight = SingleFlight()
+
+    def load(self, key: str, model: type[Model]) -> Optional[tuple[Model, float]]:
+        with self.lock:
+            if key in self.memory:
+                return self.memory[key]
+            row = self.db.execute(
+                "SELECT data, fetched_at FROM metadata WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        try:
+            entry = (model.model_validate_json(row[0]), row[1])
+        except:
+            log.warning(f"Dropping unreadable weather cache entry {key}")
+            return None
+        with self.lock:
+            self.memory[key] = entry
+        return entry
+
+    def store(self, key: str, value: BaseModel):
+        now = time.time()
+        with self.lock:
+            self.memory[key] = (value, now)
+            self.db.execute(
+                "INSERT OR REPLACE INTO metadata (key, data, fetched_at) VALUES (?, ?, ?)",
+                (key, value.model_dump_json(), now),
+            )
+            self.db.commit()
+
+    def get(self, key: str, model: type[Model], fetch: Callable[[], Model]) -> Model:
+        """
+        cached value for key, calling fetch only when there is nothing fresh enough
+        """
+        self.fetchers[key] = (model, fetch)
+        entry = self.load(key, model)
+        if entry and time.time() - entry[1] < self.ttl:
+            return entry[0]
+
+        try:
+            value = self.flight.do(key, lambda: self.fetch(key, fetch))
+        except:
+            # an expired answer beats no answer
+            if entry:
+                log.warning(f"Using expired weather metadata for {key}")
+                return entry[0]
+            raise
+        return value
+
+    def fetch(self, key: str, fetch: Callable[[], Model]) -> Model:
+        value = fetch()
+        if value is not None:
+            self.store(key, value)
+        return value
+
+    def refresh(self, limit: int = 10) -> int:
+        """
+        fetch up to limit entries that are due for refresh, return how many were
+        """
+        due = []
+        for key, (model, fetch) in list(self.fetchers.items()):
+            entry = self.load(key, model)
+            if entry is None or time.time() - entry[1] >= self.refresh_after:
+                due.append((key, fetch))
+
+        for key, fetch in due[:limit]:
+            try:
+                self.flight.do(key, lambda: self.fetch(key, fetch))
+            except:
+                log.warning(f"Failed to refresh weather metadata for {key}")
+        return min(len(due), limit)
+
+    def close(self):
+        with self.lock:
+            self.db.close()
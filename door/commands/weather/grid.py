@@ -0,0 +1,176 @@
+"""
+Packed forecasts from NWS gridpoint data.
+
+forecastGridData has each variable as a list of (start/duration, value)
+runs. They are expanded onto one hourly time axis with NumPy, then
+reduced per local day (or sampled per hour) into short lines like
+
+    Tue 18-31C 40%🌧 W15g25
+"""
+
+import datetime
+import re
+
+import numpy as np
+import pytz
+
+from ...geo import compass
+
+HOUR = 3600
+
+# gridData layers we use -> name in the summary arrays
+LAYERS = {
+    "temperature": "temp",
+    "probabilityOfPrecipitation": "pop",
+    "windSpeed": "wind",
+    "windGust": "gust",
+    "windDirection": "dir",
+}
+
+DURATION = re.compile(r"P(?:(\d+)D)?(?:T(?:(\d+)H)?(?:(\d+)M)?)?")
+
+
+def duration_seconds(value: str) -> int:
+    """
+    ISO 8601 durations as used by NWS: 'PT1H', 'P1DT6H'
+    """
+    days, hours, minutes = (int(x or 0) for x in DURATION.fullmatch(value).groups())
+    return days * 86400 + hours * HOUR + minutes * 60
+
+
+def expand(layer: dict, start: int, hours: int) -> np.ndarray:
+    """
+    one value per hour from start, NaN where the layer has nothing
+    """
+    out = np.full(hours, np.nan)
+    runs = [v for v in layer.get("values", []) if v.get("value") is not None]
+    if not runs:
+        return out
+
+    begins, counts, values = [], [], []
+    for run in runs:
+        valid, _, duration = run["validTime"].partition("/")
+        begins.append(int(datetime.datetime.fromisoformat(valid).timestamp()))
+        counts.append(max(duration_seconds(duration) // HOUR, 1))
+        values.append(run["value"])
+    begins, counts = np.array(begins), np.array(counts)
+
+    # hour offset of every hour of every run
+    first = (begins - start) // HOUR
+    within = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    index = np.repeat(first, counts) + within
+    filled = np.repeat(np.array(values, dtype=np.float64), counts)
+
+    keep = (index >= 0) & (index < hours)
+    out[index[keep]] = filled[keep]
+
+    if layer.get("uom", "").endswith("degF"):
+        out = (out - 32) * 5 / 9
+    return out
+
+
+def hourly(grid: dict, start: int, hours: int) -> dict[str, np.ndarray]:
+    """
+    every layer we use on the same hourly axis, plus the axis as 'time'
+    """
+    series = {
+        name: expand(grid.get(layer, {}), start, hours)
+        for layer, name in LAYERS.items()
+    }
+    series["time"] = start + np.arange(hours) * HOUR
+    return series
+
+
+def mean_direction(degrees: np.ndarray, weights: np.ndarray) -> float:
+    """
+    wind directions average on a circle, weighted by speed
+    """
+    ok = ~np.isnan(degrees) & ~np.isnan(weights)
+    if not ok.any():
+        return np.nan
+    radians = np.radians(degrees[ok])
+    w = weights[ok] + 1e-9
+    x, y = (w * np.cos(radians)).sum(), (w * np.sin(radians)).sum()
+    return float(np.degrees(np.arctan2(y, x)) % 360)
+
+
+def number(value: float) -> str:
+    return "?" if np.isnan(value) else f"{value:.0f}"
+
+
+def format_wind(direction: float, speed: float, gust: float) -> str:
+    reply = compass(direction) + number(speed)
+    if not np.isnan(gust) and (np.isnan(speed) or gust > speed + 5):
+        reply += f"g{gust:.0f}"
+    return reply
+
+
+def daily(grid: dict, timezone: str, days: int, now: int = None) -> list[str]:
+    """
+    'Tue 18-31C 40%🌧 W15g25' for today and the next days-1 days
+    """
+    tz = pytz.timezone(timezone)
+    now = now or int(datetime.datetime.now(pytz.UTC).timestamp())
+    today = tz.localize(
+        datetime.datetime.combine(
+            datetime.datetime.fromtimestamp(now, tz).date(), datetime.time()
+        )
+    )
+    start = int(today.timestamp())
+    s = hourly(grid, start, (days + 1) * 24)
+
+    # local day of every hour, DST-safe
+    day_of = np.array(
+        [
+            (datetime.datetime.fromtimestamp(t, tz).date() - today.date()).days
+            for t in s["time"]
+        ]
+    )
+    # only what's still ahead of us today
+    future = s["time"] >= now - HOUR
+
+    lines = []
+    for day in range(days):
+        hours = (day_of == day) & future
+        if not hours.any() or np.isnan(s["temp"][hours]).all():
+            continue
+        temp, pop = s["temp"][hours], s["pop"][hours]
+        wind, gust = s["wind"][hours], s["gust"][hours]
+
+        pop_max = np.nanmax(pop) if not np.isnan(pop).all() else np.nan
+        wind_max = np.nanmax(wind) if not np.isnan(wind).all() else np.nan
+        gust_max = np.nanmax(gust) if not np.isnan(gust).all() else np.nan
+
+        label = datetime.datetime.fromtimestamp(int(s["time"][hours][0]), tz)
+        line = f"{label:%a} {np.nanmin(temp):.0f}-{np.nanmax(temp):.0f}C"
+        if not np.isnan(pop_max):
+            line += f" {pop_max:.0f}%"
+            if pop_max >= 30:
+                line += "🌧"
+        direction = mean_direction(s["dir"][hours], wind)
+        line += " " + format_wind(direction, wind_max, gust_max)
+        lines.append(line)
+    return lines
+
+
+def hourly_lines(
+    grid: dict, timezone: str, hours: int = 24, step: int = 2, now: int = None
+) -> list[str]:
+    """
+    '14h 25C 10% W12' every step hours from now
+    """
+    tz = pytz.timezone(timezone)
+    now = now or int(datetime.datetime.now(pytz.UTC).timestamp())
+    s = hourly(grid, now - now % HOUR, hours)
+
+    lines = []
+    for i in range(0, hours, step):
+        if np.isnan(s["temp"][i]):
+            continue
+        local = datetime.datetime.fromtimestamp(int(s["time"][i]), tz)
+        line = f"{local:%H}h {s['temp'][i]:.0f}C"
+        if not np.isnan(s["pop"][i]):
+            line += f" {s['pop'][i]:.0f}%"
+        line += " " + format_wind(s["dir"][i], s["wind"][i], s["gust"][i])
+        lines.append(line)
+    return lines
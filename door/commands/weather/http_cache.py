@@ -0,0 +1,198 @@
+"""
+A small HTTP cache for api.weather.gov JSON.
+
+Responses are kept as long as their Cache-Control or Expires headers
+allow, then revalidated with If-None-Match / If-Modified-Since. A stale
+response is served right away while it is refreshed in the background
+(stale-while-revalidate), and served when the API fails (stale-if-error).
+"""
+
+from collections import OrderedDict
+from collections.abc import Callable
+from email.utils import parsedate_to_datetime
+import time
+from threading import Lock, Thread
+from typing import Any, Optional
+
+from loguru import logger as log
+import requests
+
+from ...singleflight import SingleFlight
+
+
+class Entry:
+    def __init__(self, data: Any, headers: dict):
+        self.data = data
+        self.etag: Optional[str] = headers.get("ETag")
+        self.last_modified: Optional[str] = headers.get("Last-Modified")
+        self.expires = 0.0
+        self.stale_while_revalidate = 0.0
+
+    def fresh(self) -> bool:
+        return time.time() < self.expires
+
+
+def http_date(value: Optional[str]) -> Optional[float]:
+    try:
+        return parsedate_to_datetime(value).timestamp()
+    except:
+        return None
+
+
+def cache_control(headers: dict) -> dict[str, Optional[str]]:
+    """
+    'public, max-age=300' -> {'public': None, 'max-age': '300'}
+    """
+    directives = {}
+    for part in headers.get("Cache-Control", "").split(","):
+        name, _, value = part.strip().partition("=")
+        if name:
+            directives[name.lower()] = value.strip('"') or None
+    return directives
+
+
+def freshness(headers: dict, default: float) -> Optional[float]:
+    """
+    seconds a response may be used without asking again, None if it can't be stored
+    """
+    directives = cache_control(headers)
+    if "no-store" in directives:
+        return None
+    if "no-cache" in directives:
+        return 0.0
+    for name in ("s-maxage", "max-age"):
+        if (directives.get(name) or "").isdigit():
+            return float(directives[name])
+
+    date = http_date(headers.get("Date")) or time.time()
+    expires = http_date(headers.get("Expires"))
+    if expires is not None:
+        return max(expires - date, 0.0)
+
+    # heuristic from RFC 9111: a tenth of the time since it last changed
+    modified = http_date(headers.get("Last-Modified"))
+    if modified is not None:
+        return min(max(date - modified, 0.0) / 10, default * 10)
+    return default
+
+
+class HttpCache:
+    def __init__(
+        self,
+        get: Callable[..., requests.Response] = requests.get,
+        default_ttl: float = 60,
+        stale_while_revalidate: float = 600,
+        stale_if_error: float = 86400,
+        max_entries: int = 500,
+    ):
+        self.get = get
+        self.default_ttl = default_ttl
+        self.stale_while_revalidate = stale_while_revalidate
+        self.stale_if_error = stale_if_error
+        self.max_entries = max_entries
+
+        self.lock = Lock()
+        self.entries: OrderedDict[str, Entry] = OrderedDict()
+
+        # concurrent requests for one URL share one upstream fetch
+        self.flight = SingleFlight()
+
+        # how requests were answered
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+        self.stale = 0
+
+    @staticmethod
+    def key(url: str, params: Optional[dict]) -> str:
+        return requests.Request("GET", str(url), params=params).prepare().url
+
+    def get_json(self, url: str, params: Optional[dict] = None) -> Any:
+        key = self.key(url, params)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry:
+                self.entries.move_to_end(key)
+
+        if entry and entry.fresh():
+            self.hits += 1
+            return entry.data
+
+        if entry and time.time() < entry.expires + entry.stale_while_revalidate:
+            # answer now, refresh for the next caller
+            self.stale += 1
+            self.revalidate_later(key, url, params, entry)
+            return entry.data
+
+        try:
+            return self.flight.do(key, lambda: self.fetch(key, url, params, entry))
+        except:
+            if entry and time.time() < entry.expires + self.stale_if_error:
+                log.warning(f"Serving stale {key} after a failed request")
+                self.stale += 1
+                return entry.data
+            raise
+
+    def revalidate_later(
+        self, key: str, url: str, params: Optional[dict], entry: Entry
+    ):
+        if self.flight.in_flight(key):
+            return
+
+        def run():
+            try:
+                self.flight.do(key, lambda: self.fetch(key, url, params, entry))
+            except:
+                log.warning(f"Background refresh of {key} failed")
+
+        Thread(target=run, name="wx revalidate").start()
+
+    def fetch(
+        self, key: str, url: str, params: Optional[dict], entry: Optional[Entry]
+    ) -> Any:
+        headers = {}
+        if entry and entry.etag:
+            headers["If-None-Match"] = entry.etag
+        if entry and entry.last_modified:
+            headers["If-Modified-Since"] = entry.last_modified
+
+        response = self.get(url, params=params, headers=headers)
+        if response.status_code == 304 and entry:
+            self.revalidated += 1
+            self.store(key, entry, response.headers)
+            return entry.data
+
+        response.raise_for_status()
+        self.misses += 1
+        data = response.json()
+        self.store(key, Entry(data, response.headers), response.headers)
+        return data
+
+    def store(self, key: str, entry: Entry, headers: dict):
+        ttl = freshness(headers, self.default_ttl)
+        if ttl is None:
+            with self.lock:
+                self.entries.pop(key, None)
+            return
+
+        # a 304 may carry a new validator
+        entry.etag = headers.get("ETag", entry.etag)
+        entry.last_modified = headers.get("Last-Modified", entry.last_modified)
+        entry.expires = time.time() + ttl
+        swr = cache_control(headers).get("stale-while-revalidate") or ""
+        entry.stale_while_revalidate = (
+            float(swr) if swr.isdigit() else self.stale_while_revalidate
+        )
+
+        with self.lock:
+            self.entries[key] = entry
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def status(self) -> str:
+        return (
+            f"wx cache {len(self.entries)} entries, {self.hits} hits, "
+            f"{self.revalidated} revalidated, {self.stale} stale, {self.misses} fetched, "
+            f"{self.flight.shared} shared"
+        )
@@ -0,0 +1,194 @@
+"""
+api.weather.gov responses and the requests that fetch them
+"""
+
+import datetime
+from typing import Optional
+
+import requests
+from pydantic import BaseModel, HttpUrl
+
+from ...http import HttpClient
+from .http_cache import HttpCache
+
+NWS_API = "https://api.weather.gov"
+
+
+def get_json(
+    url, params: dict = None, cache: HttpCache = None, http: HttpClient = requests
+):
+    """
+    through the cache when there is one
+    """
+    if cache:
+        return cache.get_json(url, params)
+    response = http.get(url, params=params)
+    response.raise_for_status()
+    return response.json()
+
+
+class PointInfo(BaseModel):
+    """
+    Response from api.weather.gov/points/{lat},{lon}
+    Gives information needed for forecast and
+    """
+
+    # Three-letter identifier for responsible NWS office
+    gridId: str  # also "cwa"
+    gridX: int
+    gridY: int
+
+    # forecast with ~2 periods per day
+    forecast: HttpUrl
+
+    # forecase hourly
+    forecastHourly: HttpUrl
+
+    # current observations
+    forecastGridData: HttpUrl
+
+    # which weather stations are used for observations here?
+    observationStations: HttpUrl
+
+    # information about the forecast zone so we can look up alerts
+    forecastZone: HttpUrl
+
+    # local time for forecasts, missing from entries cached by older versions
+    timeZone: Optional[str] = None
+
+
+def get_point_info(latitude, longitude, http: HttpClient = requests) -> PointInfo:
+    response = http.get(f"{NWS_API}/points/{latitude},{longitude}")
+    response.raise_for_status()
+    data = response.json()
+    return PointInfo(**data["properties"])
+
+
+class StationInfo(BaseModel):
+    """
+    Item from response to url provided by PointInfo.observationStations
+    This is how we get current observations for a single weather station.
+    """
+
+    stationIdentifier: str  # used to get current observations
+    name: str
+    timeZone: str
+    forecast: HttpUrl
+    county: HttpUrl
+    fireWeatherZone: HttpUrl
+
+
+def get_station_info(
+    station_url: HttpUrl, http: HttpClient = requests
+) -> StationInfo:
+    response = http.get(station_url)
+    data = response.json()
+    if "features" in data and len(data["features"]) > 0:
+        # blindly take the first one
+        if "properties" in data["features"][0]:
+            return StationInfo(**data["features"][0]["properties"])
+
+
+class ForecastItem(BaseModel):
+    """
+    Single forecast item from response to PointInfo.forecast
+    """
+
+    name: str
+    detailedForecast: str
+
+
+def get_forecast(forecast_url: HttpUrl, cache: HttpCache = None) -> list[ForecastItem]:
+    data = get_json(forecast_url, cache=cache)
+    return [ForecastItem(**period) for period in data["properties"]["periods"]]
+
+
+def get_grid_data(grid_url: HttpUrl, cache: HttpCache = None) -> dict:
+    """
+    raw gridpoint layers, see grid.py
+    """
+    return get_json(grid_url, cache=cache)["properties"]
+
+
+class Observation(BaseModel):
+    """
+    Single observation
+    """
+
+    timestamp: datetime.datetime
+    temperature: float
+    humidity: float
+
+
+def get_observations(station_id: str, cache: HttpCache = None) -> list[Observation]:
+    data = get_json(
+        f"{NWS_API}/stations/{station_id}/observations", {"limit": 10}, cache
+    )
+
+    observations: list[Observation] = []
+
+    for feat in data["features"]:
+        if "properties" not in feat:
+            continue
+
+        p = feat["properties"]
+        try:
+            # sometimes observations don't have temperature or relativeHumidity.. we skip them
+            obs = Observation(
+                timestamp=p["timestamp"],
+                temperature=p["temperature"]["value"],
+                humidity=p["relativeHumidity"]["value"],
+            )
+        except:
+            continue
+        observations.insert(0, obs)
+    return observations
+
+
+class Alert(BaseModel):
+    """
+    Single alert item. Alerts can be requested by latitude/longitude.
+    """
+
+    headline: str
+    description: str
+    effective: datetime.datetime
+    severity: str
+
+
+def get_alerts(latitude, longitude, cache: HttpCache = None) -> list[Alert]:
+    data = get_json(
+        f"{NWS_API}/alerts",
+        dict(
+            status="actual",
+            severity="Extreme,Severe,Moderate,Minor",
+            limit=5,
+            point=f"{latitude},{longitude}",
+        ),
+        cache,
+    )
+    return [Alert(**feats["properties"]) for feats in data["features"]]
+
+
+class ActiveAlert(BaseModel):
+    """
+    Alert from /alerts/active, with the id we use to send it only once
+    """
+
+    id: str
+    event: str
+    headline: Optional[str] = None
+    severity: str
+    expires: Optional[datetime.datetime] = None
+
+
+def zone_id(zone_url: HttpUrl) -> str:
+    """
+    'https://api.weather.gov/zones/forecast/TXZ035' -> 'TXZ035'
+    """
+    return str(zone_url).rstrip("/").rsplit("/", 1)[-1]
+
+
+def get_active_alerts(zone: str, cache: HttpCache = None) -> list[ActiveAlert]:
+    data = get_json(f"{NWS_API}/alerts/active", {"zone": zone}, cache)
+    return [ActiveAlert(**feats["properties"]) for feats in data["features"]]
@@ -0,0 +1,67 @@
+"""
+Location helpers shared by commands.
+"""
+
+from functools import lru_cache
+import math
+from threading import Lock
+
+from timezonefinder import TimezoneFinder
+
+COMPASS = ["N", "NE", "E", "SE", "S", "SW", "W", "NW"]
+
+# degrees, about 2 km of latitude, close to the NWS forecast grid
+CELL_SIZE = 0.02
+
+
+def grid_cell(
+    latitude: float, longitude: float, size: float = CELL_SIZE
+) -> tuple[float, float]:
+    """
+    center of the square cell holding a point
+
+    everything keyed by location uses cells, so nearby nodes share
+    cache entries and upstream requests
+    """
+    return (
+        round((math.floor(latitude / size) + 0.5) * size, 4),
+        round((math.floor(longitude / size) + 0.5) * size, 4),
+    )
+
+
+def compass(degrees: float) -> str:
+    """
+    'NW' for a bearing in degrees, '' for NaN
+    """
+    if math.isnan(degrees):
+        return ""
+    return COMPASS[int((degrees + 22.5) // 45) % 8]
+
+
+# one finder per process, its polygon data is read into memory once
+_finder: TimezoneFinder = None
+_finder_lock = Lock()
+
+
+def timezone_finder() -> TimezoneFinder:
+    global _finder
+    with _finder_lock:
+        if _finder is None:
+            _finder = TimezoneFinder(in_memory=True)
+        return _finder
+
+
+@lru_cache(maxsize=4096)
+def cell_timezone(cell: tuple[float, float]) -> str:
+    timezone = timezone_finder().timezone_at(lat=cell[0], lng=cell[1])
+    return timezone or "UTC"
+
+
+def timezone_at(latitude: float, longitude: float) -> str:
+    """
+    IANA time zone name for a point, 'UTC' where there is none (at sea)
+
+    resolved once per grid cell, a cell straddling a border gets the zone
+    of its center
+    """
+    return cell_timezone(grid_cell(latitude, longitude))
@@ -0,0 +1,176 @@
+"""
+One HTTP client for every command.
+
+Commands get it as self.http (set by DoorManager). It keeps connections
+alive per host, always has a timeout, retries idempotent requests with
+backoff, limits how many requests run at once against one host, and
+keeps latency and error counts per host. Retries are done here rather
+than by urllib3, so nothing sleeps while holding a host's slot.
+
+    response = self.http.get(url)
+"""
+
+import time
+from threading import BoundedSemaphore, Lock
+from typing import Optional
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import BaseAdapter, HTTPAdapter
+
+USER_AGENT = "mtdoor (https://github.com/bduhan/mtdoor)"
+
+RETRY_STATUS = (429, 500, 502, 503, 504)
+# POST isn't retried, it may not be safe to send twice
+RETRY_METHODS = ("GET", "HEAD", "OPTIONS")
+
+
+class HostBusy(requests.ConnectTimeout):
+    """
+    every slot for the host stayed taken, not retried
+    """
+
+
+class HostStats:
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def record(self, elapsed_ms: float, error: bool):
+        self.requests += 1
+        self.errors += int(error)
+        self.total_ms += elapsed_ms
+        self.max_ms = max(self.max_ms, elapsed_ms)
+
+    def __str__(self) -> str:
+        average = self.total_ms / self.requests if self.requests else 0
+        return (
+            f"{self.requests} req, {self.errors} err, "
+            f"avg {average:.0f}ms, max {self.max_ms:.0f}ms"
+        )
+
+
+class HttpClient:
+    def __init__(
+        self,
+        connect_timeout: float = 5,
+        read_timeout: float = 20,
+        retries: int = 2,
+        backoff: float = 0.5,
+        pool_size: int = 10,
+        per_host: int = 4,
+    ):
+        self.timeout = (connect_timeout, read_timeout)
+        self.retries = retries
+        self.backoff = backoff
+        self.per_host = per_host
+        # a longer Retry-After is returned to the caller instead of waited out
+        self.max_retry_after = read_timeout
+
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session = requests.Session()
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers["User-Agent"] = USER_AGENT
+
+        self.lock = Lock()
+        self.slots: dict[str, BoundedSemaphore] = {}
+        self.hosts: dict[str, HostStats] = {}
+
+    def slot(self, host: str) -> BoundedSemaphore:
+        with self.lock:
+            if host not in self.slots:
+                self.slots[host] = BoundedSemaphore(self.per_host)
+                self.hosts[host] = HostStats()
+            return self.slots[host]
+
+    def retry_delay(
+        self, attempt: int, response: requests.Response = None
+    ) -> Optional[float]:
+        """
+        seconds to wait before another attempt, None if it isn't worth waiting
+        """
+        delay = self.backoff * 2**attempt
+        if response is None or not response.headers.get("Retry-After"):
+            return delay
+        try:
+            delay = max(delay, float(response.headers["Retry-After"]))
+        except ValueError:
+            # an HTTP date, not worth parsing for this
+            return None
+        if delay > self.max_retry_after:
+            return None
+        return delay
+
+    def attempt(self, method: str, url: str, host: str, **kwargs) -> requests.Response:
+        """
+        one request while holding one of the host's slots
+        """
+        # waiting for a turn counts against the connect timeout
+        timeout = kwargs["timeout"]
+        wait = timeout[0] if isinstance(timeout, tuple) else timeout
+        slot = self.slot(host)
+        if not slot.acquire(timeout=wait):
+            raise HostBusy(f"Too many requests waiting on {host}")
+
+        started = time.monotonic()
+        error = True
+        try:
+            response = self.session.request(method, url, **kwargs)
+            error = response.status_code >= 500
+            return response
+        finally:
+            slot.release()
+            elapsed = (time.monotonic() - started) * 1000
+            with self.lock:
+                self.hosts[host].record(elapsed, error)
+
+    def request(self, method: str, url, **kwargs) -> requests.Response:
+        url = str(url)
+        host = urlsplit(url).netloc
+        kwargs.setdefault("timeout", self.timeout)
+        retries = self.retries if method.upper() in RETRY_METHODS else 0
+
+        for attempt in range(retries + 1):
+            try:
+                response = self.attempt(method, url, host, **kwargs)
+            except HostBusy:
+                raise
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt == retries:
+                    raise
+                delay = self.retry_delay(attempt)
+            else:
+                if response.status_code not in RETRY_STATUS or attempt == retries:
+                    return response
+                delay = self.retry_delay(attempt, response)
+                if delay is None:
+                    return response
+                response.close()
+            # the slot is free for others while we wait
+            time.sleep(delay)
+
+    def mount(self, adapter: BaseAdapter):
+        """
+        answer every request with adapter, e.g. http_replay.ReplayAdapter
+        retries are off from here on, so injected errors reach the caller at
+        the configured rate and each one is counted once in the host stats
+        """
+        self.retries = 0
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def get(self, url, **kwargs) -> requests.Response:
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs) -> requests.Response:
+        return self.request("POST", url, **kwargs)
+
+    def status(self) -> str:
+        with self.lock:
+            return "\n".join(f"{host}: {stats}" for host, stats in self.hosts.items())
+
+    def close(self):
+        self.session.close()
@@ -0,0 +1,257 @@
+"""
+Recorded upstream responses for testing without the network.
+
+A cassette is an NDJSON file, one response per line:
+
+    {"method": "GET", "url": "https://api.weather.gov/points/*",
+     "status": 200, "headers": {"Cache-Control": "max-age=3600"}, "body": {...}}
+
+url is matched with fnmatch and the first matching line wins, so specific
+patterns go before catch-alls. body is JSON or text. Two ways to use one:
+
+- ReplayAdapter plugs into HttpClient, so every command using self.http
+  is answered from the cassette. Set http_replay in [global].
+- 'python -m door.http_replay serve cassette.ndjson' runs a local server
+  answering by path, for clients that don't use HttpClient (set llm's
+  base_url to it).
+
+Both can add latency, errors and a rate limit (answering 429) to see how
+caching and coalescing hold up. HttpClient doesn't retry while an
+adapter from here is mounted, so every injected error reaches the
+command. RecordingAdapter writes real responses to a cassette (set
+http_record in [global]).
+"""
+
+import argparse
+from fnmatch import fnmatch
+import http.server
+import io
+import json
+from pathlib import Path
+import random
+import time
+from threading import Lock
+from urllib.parse import urlsplit
+
+from loguru import logger as log
+import requests
+from requests.adapters import BaseAdapter, HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+
+# not meaningful once a response is stored decoded
+SKIP_HEADERS = {"content-encoding", "content-length", "transfer-encoding", "connection"}
+
+
+def load_cassette(path: Path) -> list[dict]:
+    fixtures = []
+    with path.open("r", encoding="utf-8") as fd:
+        for line in fd:
+            if line.strip():
+                fixtures.append(json.loads(line))
+    return fixtures
+
+
+def body_bytes(fixture: dict) -> bytes:
+    body = fixture.get("body", "")
+    if isinstance(body, str):
+        return body.encode("utf-8")
+    return json.dumps(body).encode("utf-8")
+
+
+def match(fixtures: list[dict], method: str, url: str, path_only: bool = False) -> dict:
+    """
+    first fixture for method and url, with path_only the host is ignored
+    """
+    if path_only:
+        parts = urlsplit(url)
+        url = parts.path + (f"?{parts.query}" if parts.query else "")
+    for fixture in fixtures:
+        if fixture.get("method", "GET").upper() != method.upper():
+            continue
+        pattern = fixture["url"]
+        if path_only:
+            parts = urlsplit(pattern)
+            pattern = parts.path + (f"?{parts.query}" if parts.query else "")
+        if fnmatch(url, pattern) or fnmatch(url.split("?")[0], pattern):
+            return fixture
+    return None
+
+
+class Chaos:
+    """
+    latency, errors and a per-host rate limit, reproducible with a seed
+    """
+
+    def __init__(
+        self,
+        latency_ms: float = 0,
+        jitter_ms: float = 0,
+        error_rate: float = 0,
+        rate_limit: float = 0,
+        seed: int = 0,
+    ):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        # requests per second per host, 0 is no limit
+        self.rate_limit = rate_limit
+
+        self.lock = Lock()
+        self.random = random.Random(seed)
+        # host -> (tokens, last refill)
+        self.buckets: dict[str, tuple[float, float]] = {}
+
+    def delay(self):
+        with self.lock:
+            jitter = self.random.uniform(-self.jitter_ms, self.jitter_ms)
+        wait = max(self.latency_ms + jitter, 0) / 1000
+        if wait:
+            time.sleep(wait)
+
+    def fails(self) -> bool:
+        with self.lock:
+            return self.random.random() < self.error_rate
+
+    def limited(self, host: str) -> bool:
+        if self.rate_limit <= 0:
+            return False
+        now = time.monotonic()
+        with self.lock:
+            tokens, last = self.buckets.get(host, (self.rate_limit, now))
+            tokens = min(self.rate_limit, tokens + (now - last) * self.rate_limit)
+            if tokens < 1:
+                self.buckets[host] = (tokens, now)
+                return True
+            self.buckets[host] = (tokens - 1, now)
+            return False
+
+    def answer(self, host: str, fixture: dict) -> tuple[int, dict, bytes]:
+        """
+        (status, headers, body) after applying chaos to fixture (None is 404)
+        """
+        self.delay()
+        if self.limited(host):
+            return 429, {"Retry-After": "1"}, b"rate limited"
+        if self.fails():
+            return 503, {}, b"injected failure"
+        if fixture is None:
+            return 404, {}, b"no fixture"
+        headers = {"Content-Type": "application/json"}
+        headers.update(fixture.get("headers", {}))
+        return fixture.get("status", 200), headers, body_bytes(fixture)
+
+
+class ReplayAdapter(BaseAdapter):
+    def __init__(self, fixtures: list[dict], chaos: Chaos = None):
+        super().__init__()
+        self.fixtures = fixtures
+        self.chaos = chaos or Chaos()
+
+    def send(self, request: requests.PreparedRequest, **kwargs) -> requests.Response:
+        fixture = match(self.fixtures, request.method, request.url)
+        status, headers, body = self.chaos.answer(urlsplit(request.url).netloc, fixture)
+
+        response = requests.Response()
+        response.status_code = status
+        response.headers = CaseInsensitiveDict(headers)
+        response.raw = io.BytesIO(body)
+        response.url = request.url
+        response.request = request
+        response.reason = http.HTTPStatus(status).phrase
+        response.encoding = "utf-8"
+        return response
+
+    def close(self):
+        pass
+
+
+class RecordingAdapter(HTTPAdapter):
+    """
+    a normal adapter that also appends every response to a cassette
+    """
+
+    def __init__(self, cassette: Path, **kwargs):
+        super().__init__(**kwargs)
+        self.cassette = cassette
+        self.lock = Lock()
+
+    def send(self, request: requests.PreparedRequest, **kwargs) -> requests.Response:
+        response = super().send(request, **kwargs)
+        try:
+            body = response.json()
+        except:
+            body = response.text
+        line = json.dumps(
+            {
+                "method": request.method,
+                "url": request.url,
+                "status": response.status_code,
+                "headers": {
+                    k: v
+                    for k, v in response.headers.items()
+                    if k.lower() not in SKIP_HEADERS
+                },
+                "body": body,
+            }
+        )
+        with self.lock:
+            with self.cassette.open("a", encoding="utf-8") as fd:
+                fd.write(line + "\n")
+        return response
+
+
+def serve(fixtures: list[dict], chaos: Chaos, host: str, port: int):
+    class Handler(http.server.BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def answer(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            if length:
+                self.rfile.read(length)
+            fixture = match(fixtures, self.command, self.path, path_only=True)
+            status, headers, body = chaos.answer(self.client_address[0], fixture)
+            self.send_response(status)
+            for name, value in headers.items():
+                if name.lower() not in SKIP_HEADERS:
+                    self.send_header(name, value)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        do_GET = do_POST = do_PUT = do_DELETE = do_HEAD = answer
+
+        def log_message(self, format, *args):
+            log.debug(f"replay {self.address_string()} {format % args}")
+
+    server = http.server.ThreadingHTTPServer((host, port), Handler)
+    log.info(f"Replaying {len(fixtures)} fixtures on http://{host}:{port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+        description="Serve recorded API responses with latency and failures.",
+    )
+    parser.add_argument("command", choices=["serve"])
+    parser.add_argument("cassette", type=Path, help="NDJSON fixtures")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8999)
+    parser.add_argument("--latency-ms", type=float, default=0)
+    parser.add_argument("--jitter-ms", type=float, default=0)
+    parser.add_argument("--error-rate", type=float, default=0, help="0 to 1")
+    parser.add_argument("--rate-limit", type=float, default=0, help="req/s per client")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    chaos = Chaos(
+        args.latency_ms, args.jitter_ms, args.error_rate, args.rate_limit, args.seed
+    )
+    serve(load_cassette(args.cassette), chaos, args.host, args.port)
+
+
+if __name__ == "__main__":
+    main()
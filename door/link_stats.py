@@ -0,0 +1,144 @@
+"""
+Running link-quality statistics for every node we hear.
+
+Updated in O(1) for each received packet. Use tracker() to get the one
+instance for this process, it subscribes itself to received packets.
+"""
+
+import datetime
+import time
+from threading import Lock
+from typing import Optional
+
+import pytz
+from pubsub import pub
+from pydantic import BaseModel, Field, computed_field
+
+# weight of the newest sample in the moving averages
+EWMA_ALPHA = 0.2
+
+# hop counts at or above the last bucket are counted there
+HOP_BUCKETS = 8
+
+
+class LinkStats(BaseModel):
+    id: str
+    packets: int = 0
+    last_heard: Optional[int] = None
+    snr: Optional[float] = None
+    rssi: Optional[float] = None
+
+    # packets seen at 0, 1, 2.. hops
+    hops: list[int] = Field(default_factory=lambda: [0] * HOP_BUCKETS)
+
+    # packets per minute for the last hour, ring indexed by minute of the hour
+    minute_counts: list[int] = Field(default_factory=lambda: [0] * 60, exclude=True)
+    minute_marks: list[int] = Field(default_factory=lambda: [0] * 60, exclude=True)
+
+    @computed_field
+    @property
+    def packets_per_hour(self) -> int:
+        minute = int(time.time()) // 60
+        return sum(
+            count
+            for count, mark in zip(self.minute_counts, self.minute_marks)
+            if mark > minute - 60
+        )
+
+    @computed_field
+    @property
+    def last_heard_at(self) -> Optional[datetime.datetime]:
+        if self.last_heard:
+            return datetime.datetime.fromtimestamp(self.last_heard, pytz.UTC)
+
+    def update(self, packet: dict):
+        now = packet.get("rxTime") or int(time.time())
+        self.packets += 1
+        self.last_heard = now
+
+        # signal strength is meaningless for packets from MQTT
+        if not packet.get("viaMqtt"):
+            snr = packet.get("rxSnr")
+            rssi = packet.get("rxRssi")
+            if snr is not None:
+                self.snr = snr if self.snr is None else ewma(self.snr, snr)
+            if rssi is not None:
+                self.rssi = rssi if self.rssi is None else ewma(self.rssi, rssi)
+
+        hop_start = packet.get("hopStart")
+        hop_limit = packet.get("hopLimit")
+        if hop_start is not None and hop_limit is not None:
+            self.hops[min(max(hop_start - hop_limit, 0), HOP_BUCKETS - 1)] += 1
+
+        minute = now // 60
+        slot = minute % 60
+        if self.minute_marks[slot] != minute:
+            self.minute_marks[slot] = minute
+            self.minute_counts[slot] = 0
+        self.minute_counts[slot] += 1
+
+
+def ewma(average: float, sample: float) -> float:
+    return average + EWMA_ALPHA * (sample - average)
+
+
+class LinkTracker:
+    def __init__(self):
+        self.lock = Lock()
+        self.nodes: dict[str, LinkStats] = {}
+
+    def on_receive(self, packet, interface):
+        node = packet.get("fromId")
+        if not node:
+            return
+        with self.lock:
+            if node not in self.nodes:
+                self.nodes[node] = LinkStats(id=node)
+            self.nodes[node].update(packet)
+
+    def get(self, node: str) -> Optional[LinkStats]:
+        with self.lock:
+            if node in self.nodes:
+                return self.nodes[node].model_copy(deep=True)
+
+    def snapshot(self) -> list[LinkStats]:
+        with self.lock:
+            return [stats.model_copy(deep=True) for stats in self.nodes.values()]
+
+    def restore(self, stats: list[LinkStats]):
+        """
+        seed from storage, without replacing anything heard since
+        """
+        with self.lock:
+            for s in stats:
+                self.nodes.setdefault(s.id, s)
+
+
+_tracker: LinkTracker = None
+_tracker_lock = Lock()
+
+
+def tracker() -> LinkTracker:
+    global _tracker
+    with _tracker_lock:
+        if _tracker is None:
+            _tracker = LinkTracker()
+            pub.subscribe(_tracker.on_receive, "meshtastic.receive")
+        return _tracker
+
+
+def format_link_stats(stats: LinkStats) -> str:
+    reply = f"{stats.id}: {stats.packets} packets, {stats.packets_per_hour}/h\n"
+    if stats.snr is not None:
+        reply += f"SNR {stats.snr:.1f}"
+        if stats.rssi is not None:
+            reply += f" RSSI {stats.rssi:.0f}"
+        reply += "\n"
+    if any(stats.hops):
+        reply += "Hops " + " ".join(
+            f"{hops}:{count}" for hops, count in enumerate(stats.hops) if count
+        ) + "\n"
+    if stats.last_heard:
+        ago = int(time.time()) - stats.last_heard
+        reply += f"Heard {ago // 60}m ago" if ago >= 60 else f"Heard {ago}s ago"
+    return reply.strip()
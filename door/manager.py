@@ -1,8 +1,11 @@
 from configparser import ConfigParser
 from inspect import getmodule
+from pathlib import Path
 from meshtastic.mesh_interface import MeshInterface
 from loguru import logger as log
 from pubsub import pub
+from .http import HttpClient
+from .http_replay import Chaos, ReplayAdapter, RecordingAdapter, load_cassette
 from .base_command import (
     BaseCommand,
     CommandLoadError,
@@ -27,11 +30,43 @@ class DoorManager:
         # keep track of the commands added, don't let duplicates happen
         self.commands = []
 
+        # every command shares connections, timeouts and retries
+        self.http = HttpClient(
+            connect_timeout=settings.getfloat(
+                "global", "http_connect_timeout", fallback=5
+            ),
+            read_timeout=settings.getfloat("global", "http_read_timeout", fallback=20),
+            retries=settings.getint("global", "http_retries", fallback=2),
+            per_host=settings.getint("global", "http_per_host", fallback=4),
+        )
+        self.replay_http(settings)
+
         pub.subscribe(self.on_text, "meshtastic.receive.text")
         pub.subscribe(self.send_dm, self.dm_topic)
 
         log.info(f"DoorManager is connected to {self.me}")
 
+    def replay_http(self, settings: ConfigParser):
+        """
+        answer HTTP from a cassette, or record one, for testing offline
+        """
+        replay = settings.get("global", "http_replay", fallback=None)
+        record = settings.get("global", "http_record", fallback=None)
+        if replay:
+            option = lambda name: settings.getfloat("global", name, fallback=0)
+            chaos = Chaos(
+                latency_ms=option("http_replay_latency_ms"),
+                jitter_ms=option("http_replay_jitter_ms"),
+                error_rate=option("http_replay_error_rate"),
+                rate_limit=option("http_replay_rate_limit"),
+                seed=int(option("http_replay_seed")),
+            )
+            self.http.mount(ReplayAdapter(load_cassette(Path(replay)), chaos))
+            log.warning(f"HTTP is answered from {replay}, not the network")
+        elif record:
+            self.http.mount(RecordingAdapter(Path(record)))
+            log.warning(f"Recording HTTP responses to {record}")
+
     def add_command(self, command: BaseCommand):
         if not hasattr(command, "command"):
             raise CommandLoadError("No 'command' property on {command}")
@@ -54,6 +89,9 @@ class DoorManager:
         # commands can access the ConfigParser settings file
         cmd.settings = self.settings
 
+        # commands should make HTTP requests with this
+        cmd.http = self.http
+
         # call "load" on the command class
         try:
             log.debug(f"Loading '{cmd.command}' command from '{module}'..")
@@ -179,6 +217,7 @@ class DoorManager:
                 pass
             except:
                 log.exception(f"{command.__name__}.periodic failed")
+        log.debug(f"HTTP by host:\n{self.http.status()}")
 
     def shutdown(self):
         log.debug(f"Shutting down {len(self.commands)} commands..")
@@ -188,3 +227,4 @@ class DoorManager:
                 command.shutdown()
             except CommandActionNotImplemented:
                 pass
+        self.http.close()
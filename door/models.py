@@ -101,24 +101,58 @@ class NodeInfo(BaseModel):
 class EnvironmentMetric(BaseModel):
     """
     source: packet
+
+    packets use camelCase names, our columns use snake_case
     """
 
     id: str = Field(validation_alias=AliasChoices("id", "fromId"), default=None)
     time: Optional[int] = None
     temperature: Optional[float] = None
-    relative_humidity: Optional[float] = None
-    barometric_pressure: Optional[float] = None
-    gas_resistance: Optional[float] = None
+    relative_humidity: Optional[float] = Field(
+        default=None,
+        validation_alias=AliasChoices("relative_humidity", "relativeHumidity"),
+    )
+    barometric_pressure: Optional[float] = Field(
+        default=None,
+        validation_alias=AliasChoices("barometric_pressure", "barometricPressure"),
+    )
+    gas_resistance: Optional[float] = Field(
+        default=None, validation_alias=AliasChoices("gas_resistance", "gasResistance")
+    )
     voltage: Optional[float] = None
     current: Optional[float] = None
     iaq: Optional[int] = None
     distance: Optional[float] = None
     lux: Optional[float] = None
-    white_lux: Optional[float] = None
-    ir_lux: Optional[float] = None
-    uv_lux: Optional[float] = None
-    wind_direction: Optional[int] = None
-    wind_speed: Optional[float] = None
+    white_lux: Optional[float] = Field(
+        default=None, validation_alias=AliasChoices("white_lux", "whiteLux")
+    )
+    ir_lux: Optional[float] = Field(
+        default=None, validation_alias=AliasChoices("ir_lux", "irLux")
+    )
+    uv_lux: Optional[float] = Field(
+        default=None, validation_alias=AliasChoices("uv_lux", "uvLux")
+    )
+    wind_direction: Optional[int] = Field(
+        default=None, validation_alias=AliasChoices("wind_direction", "windDirection")
+    )
+    wind_speed: Optional[float] = Field(
+        default=None, validation_alias=AliasChoices("wind_speed", "windSpeed")
+    )
     weight: Optional[float] = None
-    wind_gust: Optional[float] = None
-    wind_lull: Optional[float] = None
+    wind_gust: Optional[float] = Field(
+        default=None, validation_alias=AliasChoices("wind_gust", "windGust")
+    )
+    wind_lull: Optional[float] = Field(
+        default=None, validation_alias=AliasChoices("wind_lull", "windLull")
+    )
+
+
+class Neighbor(BaseModel):
+    """
+    source: packet (one entry of NeighborInfo.neighbors)
+    """
+
+    id: str = Field(validation_alias=AliasChoices("id", "fromId"), default=None)
+    neighbor: str
+    snr: Optional[float] = None
@@ -0,0 +1,57 @@
+"""
+Coalesce concurrent calls for the same thing into one.
+
+While a call for a key is running, other callers with the same key wait
+for it and get its result (or its exception) instead of starting their own.
+"""
+
+from collections.abc import Callable
+from threading import Event, Lock
+from typing import Any, Hashable
+
+
+class Call:
+    def __init__(self):
+        self.done = Event()
+        self.result: Any = None
+        self.error: BaseException = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    def __init__(self):
+        self.lock = Lock()
+        self.calls: dict[Hashable, Call] = {}
+
+        # callers that got a result without making their own call
+        self.shared = 0
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        with self.lock:
+            call = self.calls.get(key)
+            leader = call is None
+            if leader:
+                call = self.calls[key] = Call()
+            else:
+                call.waiters += 1
+                self.shared += 1
+
+        if not leader:
+            call.done.wait()
+        else:
+            try:
+                call.result = fn()
+            except BaseException as e:
+                call.error = e
+            finally:
+                with self.lock:
+                    del self.calls[key]
+                call.done.set()
+
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    def in_flight(self, key: Hashable) -> bool:
+        with self.lock:
+            return key in self.calls